@@ -13,8 +13,10 @@ import seaborn as sns
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from collections import defaultdict, Counter
+import heapq
 import json
 import warnings
+from operator import itemgetter
 warnings.filterwarnings('ignore')
 
 from config import DATA_DIR
@@ -33,8 +35,34 @@ class AdvancedAnalytics:
     def __init__(self):
         self.data_cache = {}  # Cache per user: {user_id: (data, timestamp)}
         self.cache_duration = timedelta(minutes=5)  # 5-minute cache
+        self.report_cache = {}  # Built reports: {user_id: (data_timestamp, {report: result})}
         logger.info("🔥 Advanced Analytics Engine initialized with multi-user support")
-    
+
+    def has_cached_data(self, user_id: int) -> bool:
+        """⚡ Check whether a still-valid cached dataset exists for the user"""
+        cached = self.data_cache.get(user_id)
+        return cached is not None and datetime.now() - cached[1] < self.cache_duration
+
+    def get_cached_report(self, user_id: int, report: str) -> Optional[Dict[str, Any]]:
+        """⚡ Return a report built from the user's current cached dataset, if any"""
+        cached = self.report_cache.get(user_id)
+        if cached is None:
+            return None
+        if self.has_cached_data(user_id) and cached[0] == self.data_cache[user_id][1]:
+            return cached[1].get(report)
+        # Built from a dataset that has since expired or been replaced
+        self.report_cache.pop(user_id, None)
+        return None
+
+    def _store_report(self, user_id: int, report: str, result: Dict[str, Any]):
+        """💾 Remember a report for as long as the dataset it was built from stays cached"""
+        cached = self.data_cache.get(user_id)
+        if cached and "error" not in result:
+            entry = self.report_cache.get(user_id)
+            if entry is None or entry[0] != cached[1]:
+                entry = self.report_cache[user_id] = (cached[1], {})
+            entry[1][report] = result
+
     def load_fresh_data(self, user_id: int) -> pd.DataFrame:
         """💾 Load fresh data from Google Sheets with user-specific filtering and intelligent caching"""
         now = datetime.now()
@@ -77,8 +105,9 @@ class AdvancedAnalytics:
             # Clean and normalize data
             df = self._clean_and_normalize_data(df)
             
-            # Update user-specific cache
+            # Update user-specific cache; reports built from the old dataset are now stale
             self.data_cache[user_id] = (df, now)
+            self.report_cache.pop(user_id, None)
             
             logger.info(f"✅ Loaded {len(df)} records for user {user_id}")
             return df
@@ -191,6 +220,11 @@ class AdvancedAnalytics:
     
     def generate_executive_dashboard(self, user_id: int) -> Dict[str, Any]:
         """📈 Generate comprehensive executive dashboard for specific user"""
+        cached_report = self.get_cached_report(user_id, 'dashboard')
+        if cached_report:
+            logger.debug(f"⚡ Using cached executive dashboard for user {user_id}")
+            return cached_report
+        
         df = self.load_fresh_data(user_id)
         
         if df.empty:
@@ -246,11 +280,17 @@ class AdvancedAnalytics:
             "generated_at": datetime.now().isoformat()
         }
         
+        self._store_report(user_id, 'dashboard', dashboard)
         logger.info("✅ Executive dashboard generated successfully")
         return dashboard
     
     def generate_location_analytics(self, user_id: int) -> Dict[str, Any]:
         """📍 Generate comprehensive location-based analytics for specific user"""
+        cached_report = self.get_cached_report(user_id, 'location')
+        if cached_report:
+            logger.debug(f"⚡ Using cached location analytics for user {user_id}")
+            return cached_report
+        
         df = self.load_fresh_data(user_id)
         
         if df.empty:
@@ -292,6 +332,7 @@ class AdvancedAnalytics:
                 "generated_at": datetime.now().isoformat()
             }
             
+            self._store_report(user_id, 'location', analytics)
             logger.info("✅ Location analytics generated successfully")
             return analytics
             
@@ -578,31 +619,27 @@ class AdvancedAnalytics:
             if 'date' in gps_data.columns:
                 gps_data = gps_data.sort_values('date')
             
-            # Calculate distances between consecutive visits
-            distances = []
-            for i in range(1, len(gps_data)):
-                lat1, lon1 = gps_data.iloc[i-1]['gps_latitude'], gps_data.iloc[i-1]['gps_longitude']
-                lat2, lon2 = gps_data.iloc[i]['gps_latitude'], gps_data.iloc[i]['gps_longitude']
-                
-                # Haversine distance approximation
-                distance = np.sqrt((lat2 - lat1)**2 + (lon2 - lon1)**2) * 111  # km
-                distances.append(distance)
+            # Calculate distances between consecutive visits in one vectorized pass
+            # (Haversine distance approximation: degrees * 111 km)
+            lat_steps = np.diff(gps_data['gps_latitude'].to_numpy(dtype=float))
+            lon_steps = np.diff(gps_data['gps_longitude'].to_numpy(dtype=float))
+            distances = np.hypot(lat_steps, lon_steps) * 111  # km
             
-            if distances:
-                avg_distance = np.mean(distances)
-                total_distance = sum(distances)
+            if distances.size:
+                avg_distance = distances.mean()
+                total_distance = distances.sum()
                 
                 # Identify potential route optimizations
-                long_distances = [d for d in distances if d > avg_distance * 1.5]
-                optimization_potential = len(long_distances) / len(distances) * 100 if distances else 0
+                long_distances = distances[distances > avg_distance * 1.5]
+                optimization_potential = len(long_distances) / len(distances) * 100
                 
                 return {
                     "status": "success",
                     "route_metrics": {
                         "total_distance_covered": f"{total_distance:.1f} km",
                         "average_distance_between_visits": f"{avg_distance:.1f} km",
-                        "longest_single_distance": f"{max(distances):.1f} km",
-                        "shortest_single_distance": f"{min(distances):.1f} km"
+                        "longest_single_distance": f"{distances.max():.1f} km",
+                        "shortest_single_distance": f"{distances.min():.1f} km"
                     },
                     "optimization_insights": {
                         "optimization_potential": f"{optimization_potential:.1f}%",
@@ -653,8 +690,8 @@ class AdvancedAnalytics:
                         location_trends[location] = slope
             
             # Sort locations by trend
-            trending_up = {k: v for k, v in sorted(location_trends.items(), key=lambda x: x[1], reverse=True)[:3]}
-            trending_down = {k: v for k, v in sorted(location_trends.items(), key=lambda x: x[1])[:3]}
+            trending_up = dict(heapq.nlargest(3, location_trends.items(), key=itemgetter(1)))
+            trending_down = dict(heapq.nsmallest(3, location_trends.items(), key=itemgetter(1)))
             
             # GPS adoption trend
             if df['has_gps'].any():
@@ -1041,9 +1078,9 @@ class AdvancedAnalytics:
             client_col = 'Client' if 'Client' in df.columns else 'client'
             amount_col = 'Amount' if 'Amount' in df.columns else 'amount'
             
-            client_revenue = df.groupby(client_col)[amount_col].sum().sort_values(ascending=False)
+            client_revenue = df.groupby(client_col)[amount_col].sum()
             if not client_revenue.empty:
-                top_client_share = (client_revenue.iloc[0] / client_revenue.sum() * 100)
+                top_client_share = (client_revenue.max() / client_revenue.sum() * 100)
                 if top_client_share > 50:
                     risks.append(f"🚨 HIGH RISK: {top_client_share:.1f}% revenue from single client")
                 elif top_client_share > 30:
@@ -1051,9 +1088,9 @@ class AdvancedAnalytics:
             
             # Location dependency risk
             location_col = 'Location' if 'Location' in df.columns else 'location'
-            location_revenue = df.groupby(location_col)[amount_col].sum().sort_values(ascending=False)
+            location_revenue = df.groupby(location_col)[amount_col].sum()
             if not location_revenue.empty and len(location_revenue) > 1:
-                top_location_share = (location_revenue.iloc[0] / location_revenue.sum() * 100)
+                top_location_share = (location_revenue.max() / location_revenue.sum() * 100)
                 if top_location_share > 70:
                     risks.append(f"📍 LOCATION RISK: {top_location_share:.1f}% revenue from single location")
             
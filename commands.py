@@ -6,9 +6,14 @@ Advanced command handlers with AI integration and intelligent responses
 """
 
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
+import asyncio
 import datetime
-from typing import Dict, Any, Optional
+import functools
+from html import escape
+from itertools import islice
+from typing import Callable, Dict, Any, Optional
 
 # Core imports
 from summaries import send_summary
@@ -16,6 +21,7 @@ from menus import MenuSystem
 from decorators import handle_errors, rate_limit
 from logger import logger
 from company_manager import company_manager
+from analytics import analytics_engine
 
 # AI and processing imports
 from ai_response_engine import ai_response_engine
@@ -23,6 +29,193 @@ from input_processor import input_processor
 from batch_handler import batch_handler
 from parallel_processor import parallel_processor
 
+# Background analytics builds started by _prefetch_report: {(user_id, report): task}
+_reports_in_flight: Dict[tuple, asyncio.Future] = {}
+
+# Shown by /top when the user has data but no client/location revenue yet
+_EMPTY_TOP_PERFORMERS_TEXT = (
+    "🏆 <b>TOP PERFORMERS ANALYSIS</b>\n\n"
+    "📭 No client or location revenue recorded yet.\n\n"
+    "💡 Log your first sale with <code>/sales</code> and your rankings will appear here!"
+)
+
+# Static help bodies, filled per request with str.format
+_ANALYTICS_HELP_TEMPLATE = """
+📚 **AI-ENHANCED ANALYTICS COMMANDS**
+🏢 **Current Company:** {display_name}
+
+🤖 **AI-POWERED EXECUTIVE LEVEL:**
+• `/dashboard` - AI-enhanced business overview with intelligent insights
+• `/predictions` - Machine learning forecasts & predictive analytics
+
+📊 **INTELLIGENT VISUAL ANALYTICS:**  
+• `/charts` - AI-generated professional charts with parallel processing
+• `/trends` - Smart revenue & performance trend analysis
+
+📍 **GPS TERRITORY INTELLIGENCE:**
+• `/location_analytics` - AI territory insights with GPS data analysis
+• `/location` - Share GPS for intelligent territory tracking
+
+📈 **PERFORMANCE TRACKING:**
+• `/today` - AI-enhanced daily performance with insights
+• `/week` - Weekly analysis with trend intelligence  
+• `/month` - Comprehensive monthly review with predictions
+
+🔍 **QUICK AI INSIGHTS:**
+• `/top` - AI-ranked top clients & locations with performance analysis
+• Natural language queries - "Show me sales trends" (coming soon)
+
+🚀 **AI FEATURES:**
+• 🧠 Natural language processing for entries
+• 📍 GPS location intelligence and territory optimization  
+• ⚡ Parallel processing for faster analytics
+• 🔮 Predictive insights and forecasting
+• 📊 Automated chart generation with AI insights
+• 🤖 Intelligent recommendations and tips
+
+💡 **PRO AI TIPS:**
+• Use natural language: "Sold 5 tablets to Apollo for ₹25000"
+• Share GPS location for territory intelligence
+• Enable batch processing for multiple entries
+• All analytics update automatically with AI enhancement!
+
+🎯 **Example Usage:**
+Just type `/dashboard` and get instant AI-powered business insights!
+
+{tip}
+    """
+
+_AI_HELP_TEMPLATE = """
+🤖 **AI-POWERED PERFORMANCE TRACKER**
+🏢 **Current Company:** {display_name}
+
+🧠 **ARTIFICIAL INTELLIGENCE FEATURES:**
+
+📝 **NATURAL LANGUAGE PROCESSING:**
+• Smart entry parsing - just describe your sale naturally
+• Example: "Sold 5 tablets to Apollo Pharmacy for ₹25000"
+• AI understands context, quantities, and amounts
+• Automatic error correction and validation
+
+📍 **LOCATION INTELLIGENCE:**
+• GPS-powered territory analytics
+• Automatic location tagging for sales entries
+• Route optimization suggestions
+• Geographic performance insights
+• Territory trend analysis
+
+🔮 **PREDICTIVE ANALYTICS:**
+• AI-powered sales forecasting
+• Trend prediction and analysis
+• Performance pattern recognition
+• Growth opportunity identification
+
+📊 **INTELLIGENT DASHBOARDS:**
+• Real-time business intelligence
+• AI-generated insights and recommendations
+• Performance benchmarking
+• Automated report generation
+
+⚡ **ADVANCED PROCESSING:**
+• Parallel processing for faster analytics
+• Batch entry processing for multiple sales
+• Smart data validation and cleanup
+• Automated chart generation
+
+🎯 **SMART RECOMMENDATIONS:**
+• Personalized business insights
+• Territory optimization suggestions
+• Client relationship recommendations
+• Performance improvement tips
+
+🚀 **HOW TO USE AI FEATURES:**
+
+1️⃣ **Natural Language Entries:**
+   Just type: "Sold 10 medicines to City Hospital for ₹15000"
+   AI will parse: Client, Location, Orders, Amount automatically
+
+2️⃣ **GPS Location Sharing:**
+   Use `/location` to share GPS for territory insights
+   AI will enhance all future entries with location data
+
+3️⃣ **AI Analytics:**
+   • `/dashboard` - AI-powered executive overview
+   • `/predictions` - Machine learning forecasts
+   • `/location_analytics` - Territory intelligence
+
+4️⃣ **Batch Processing:**
+   Enter multiple sales at once, AI will process them all
+
+💡 **PRO AI TIPS:**
+• Be descriptive in your entries for better AI parsing
+• Share GPS location regularly for territory insights
+• Use natural language - AI understands context
+• Check `/predictions` for growth opportunities
+• Review `/location_analytics` for territory optimization
+
+🔬 **AI TECHNOLOGY STACK:**
+• Google Gemini 2.5 Flash for natural language processing
+• Advanced analytics engine with machine learning
+• GPS coordinate processing and geocoding
+• Parallel processing for high performance
+• Intelligent caching for faster responses
+
+🎉 **GETTING STARTED:**
+Try saying: "I sold 3 boxes of medicine to Metro Hospital for ₹12000"
+The AI will automatically understand and log your sale!
+
+💪 **Remember:** The more you use AI features, the smarter the system becomes at understanding your business patterns!
+"""
+
+def _prefetch_report(context: ContextTypes.DEFAULT_TYPE, user_id: int, report: str, builder):
+    """🔮 Build the user's likely next analytics view in the background"""
+    key = (user_id, report)
+    if key in _reports_in_flight or analytics_engine.get_cached_report(user_id, report) is not None:
+        return
+    task = context.application.create_task(asyncio.to_thread(builder, user_id))
+    _reports_in_flight[key] = task
+    task.add_done_callback(lambda _: _reports_in_flight.pop(key, None))
+
+async def _await_prefetched_report(user_id: int, report: str):
+    """⏳ Wait for an in-flight background build so the handler reads it from cache instead of rebuilding"""
+    task = _reports_in_flight.get((user_id, report))
+    if task is None:
+        return
+    try:
+        # Shield so a cancelled handler doesn't cancel the shared build
+        await asyncio.shield(task)
+    except Exception as e:
+        logger.warning(f"⚠️ Background {report} build failed for user {user_id}: {e}")
+
+async def _send_analytics_message(update: Update, loading_msg, text: str, **kwargs):
+    """📤 Edit the loading placeholder if one was sent, otherwise reply directly"""
+    if loading_msg:
+        return await loading_msg.edit_text(text, **kwargs)
+    return await update.message.reply_text(text, **kwargs)
+
+def require_registration(func: Callable) -> Callable:
+    """
+    Registration guard for command handlers
+    
+    Replies with the registration prompt for unregistered users; otherwise stores
+    the user's company key and info in context.user_data['_company'] and
+    context.user_data['_company_info'] before calling the handler.
+    """
+    @functools.wraps(func)
+    async def async_wrapper(update, context, *args, **kwargs) -> Any:
+        user = update.effective_user
+        # Mappings live in memory; one lookup covers both registration and company
+        company = company_manager.get_user_company(user.id)
+        if company is None:
+            await update.message.reply_text("❌ Please register with a company first using `/company`")
+            return None
+        
+        context.user_data['_company'] = company
+        context.user_data['_company_info'] = company_manager.get_company_info(company)
+        return await func(update, context, *args, **kwargs)
+    
+    return async_wrapper
+
 @rate_limit(calls_per_minute=5)
 @handle_errors(notify_user=True)
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -290,8 +483,7 @@ async def dashboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     loading_msg = await update.message.reply_text("🤖 AI is analyzing your business data...")
     
     try:
-        from analytics import analytics_engine
-        
+        await _await_prefetched_report(user.id, 'dashboard')
         dashboard = analytics_engine.generate_executive_dashboard(user.id)
         
         if "error" in dashboard:
@@ -352,8 +544,6 @@ async def predictions_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     loading_msg = await update.message.reply_text("🔮 AI is analyzing patterns and generating predictions...")
     
     try:
-        from analytics import analytics_engine
-        
         predictions = analytics_engine.generate_predictive_insights(user.id)
         
         if "error" in predictions:
@@ -434,8 +624,6 @@ async def charts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     loading_msg = await update.message.reply_text("📊 AI is creating professional charts with parallel processing...")
     
     try:
-        from analytics import analytics_engine
-        
         # Use parallel processing for chart generation
         chart_files = await parallel_processor.process_chart_generation_parallel([
             {'type': 'revenue_trend', 'user_id': user.id},
@@ -445,7 +633,6 @@ async def charts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if not chart_files:
             # Fallback to regular chart generation
-            from analytics import analytics_engine
             chart_files = analytics_engine.generate_advanced_charts(user.id)
         
         if not chart_files:
@@ -479,69 +666,67 @@ async def charts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @rate_limit(calls_per_minute=5)
 @handle_errors(notify_user=True)
+@require_registration
 async def location_analytics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """📍 Enhanced GPS Location Analytics with Comprehensive Territory Intelligence"""
     user = update.effective_user
     logger.info(f"📍 Location analytics requested by user {user.id}")
     
-    if not company_manager.is_user_registered(user.id):
-        await update.message.reply_text("❌ Please register with a company first using `/company`")
-        return
-    
-    loading_msg = await update.message.reply_text("📍 AI is analyzing GPS location data and territory patterns...")
+    # Skip the placeholder round-trip when the user's data is already cached
+    loading_msg = None
+    if not analytics_engine.has_cached_data(user.id):
+        loading_msg = await update.message.reply_text("📍 Analyzing...")
     
     try:
-        from analytics import AdvancedAnalytics
-        analytics_engine = AdvancedAnalytics()
-        
         location_analytics = analytics_engine.generate_location_analytics(user.id)
         
         if "error" in location_analytics:
-            await loading_msg.edit_text(f"❌ {location_analytics['error']}")
+            await _send_analytics_message(update, loading_msg, f"❌ {location_analytics['error']}")
             return
         
-        message = "📍 **COMPREHENSIVE GPS LOCATION ANALYTICS**\n\n"
-        message += f"📅 **Analysis Period:** {location_analytics['period']}\n\n"
+        parts = ["📍 <b>COMPREHENSIVE GPS LOCATION ANALYTICS</b>\n\n"]
+        parts.append(f"📅 <b>Analysis Period:</b> {location_analytics['period']}\n\n")
         
         # GPS Coverage Overview
         gps_coverage = location_analytics['gps_coverage']
         coverage_pct = gps_coverage['coverage_percentage']
         coverage_emoji = "🎯" if coverage_pct > 80 else "📈" if coverage_pct > 60 else "💡"
         
-        message += f"{coverage_emoji} **GPS COVERAGE ANALYSIS:**\n"
-        message += f"• Total Entries: {gps_coverage['total_entries']}\n"
-        message += f"• GPS Enhanced: {gps_coverage['gps_enhanced_entries']}\n"
-        message += f"• Coverage Rate: {coverage_pct:.1f}%\n\n"
+        parts.append(f"{coverage_emoji} <b>GPS COVERAGE ANALYSIS:</b>\n")
+        parts.append(f"• Total Entries: {gps_coverage['total_entries']}\n")
+        parts.append(f"• GPS Enhanced: {gps_coverage['gps_enhanced_entries']}\n")
+        parts.append(f"• Coverage Rate: {coverage_pct:.1f}%\n\n")
         
         # Territory Performance
         territory_perf = location_analytics['territory_performance']
         if territory_perf.get('total_territories', 0) > 0:
-            message += "🗺️ **TERRITORY PERFORMANCE:**\n"
-            message += f"• Total Territories: {territory_perf['total_territories']}\n"
+            parts.append("🗺️ <b>TERRITORY PERFORMANCE:</b>\n")
+            parts.append(f"• Total Territories: {territory_perf['total_territories']}\n")
             
             top_territory = territory_perf['top_territory']
-            message += f"• Top Territory: **{top_territory['name']}**\n"
-            message += f"  💰 Revenue: {top_territory['revenue']}\n"
-            message += f"  📍 Visits: {top_territory['visits']}\n\n"
+            parts.append(f"• Top Territory: <b>{escape(str(top_territory['name']))}</b>\n")
+            parts.append(f"  💰 Revenue: {top_territory['revenue']}\n")
+            parts.append(f"  📍 Visits: {top_territory['visits']}\n\n")
             
             # Territory Rankings
             rankings = territory_perf.get('territory_rankings', {})
             if rankings:
-                message += "🏆 **TOP TERRITORIES:**\n"
-                for i, (location, stats) in enumerate(list(rankings.items())[:3], 1):
-                    efficiency_emoji = "🔥" if stats['efficiency_score'] > 20000 else "📈" if stats['efficiency_score'] > 10000 else "💡"
-                    message += f"{i}. {efficiency_emoji} **{location}**\n"
-                    message += f"   💰 {stats['revenue']} | 📍 {stats['visits']} visits\n"
-                    message += f"   👥 {stats['clients']} clients | ⚡ ₹{stats['efficiency_score']}/visit\n"
-                message += "\n"
+                parts.append("🏆 <b>TOP TERRITORIES:</b>\n")
+                for i, (location, stats) in enumerate(islice(rankings.items(), 3), 1):
+                    score = stats['efficiency_score']
+                    efficiency_emoji = "🔥" if score > 20000 else "📈" if score > 10000 else "💡"
+                    parts.append(f"{i}. {efficiency_emoji} <b>{escape(str(location))}</b>\n")
+                    parts.append(f"   💰 {stats['revenue']} | 📍 {stats['visits']} visits\n")
+                    parts.append(f"   👥 {stats['clients']} clients | ⚡ ₹{score}/visit\n")
+                parts.append("\n")
         
         # Location Efficiency Analysis
         efficiency = location_analytics['location_efficiency']
         if 'overall_metrics' in efficiency:
             overall = efficiency['overall_metrics']
-            message += "📊 **LOCATION EFFICIENCY:**\n"
-            message += f"• Avg Revenue/Location: {overall['avg_revenue_per_location']}\n"
-            message += f"• Avg Visits/Location: {overall['avg_visits_per_location']}\n"
+            parts.append("📊 <b>LOCATION EFFICIENCY:</b>\n")
+            parts.append(f"• Avg Revenue/Location: {overall['avg_revenue_per_location']}\n")
+            parts.append(f"• Avg Visits/Location: {overall['avg_visits_per_location']}\n")
             
             # GPS vs Manual comparison
             gps_vs_manual = efficiency.get('gps_vs_manual', {})
@@ -549,29 +734,29 @@ async def location_analytics_command(update: Update, context: ContextTypes.DEFAU
                 gps_data = gps_vs_manual['gps_enhanced']
                 manual_data = gps_vs_manual['manual_entry']
                 
-                message += f"\n🎯 **GPS vs Manual Entry:**\n"
-                message += f"• GPS Enhanced: {gps_data['count']} entries, {gps_data['avg_revenue']} avg\n"
-                message += f"• Manual Entry: {manual_data['count']} entries, {manual_data['avg_revenue']} avg\n"
+                parts.append(f"\n🎯 <b>GPS vs Manual Entry:</b>\n")
+                parts.append(f"• GPS Enhanced: {gps_data['count']} entries, {gps_data['avg_revenue']} avg\n")
+                parts.append(f"• Manual Entry: {manual_data['count']} entries, {manual_data['avg_revenue']} avg\n")
                 
                 advantage = gps_vs_manual.get('gps_advantage', {})
                 if advantage.get('revenue_boost') != 'N/A':
-                    message += f"• GPS Advantage: {advantage['revenue_boost']} revenue boost\n"
-            message += "\n"
+                    parts.append(f"• GPS Advantage: {advantage['revenue_boost']} revenue boost\n")
+            parts.append("\n")
         
         # Geographic Distribution
         geo_dist = location_analytics['geographic_distribution']
         if geo_dist.get('status') == 'success':
             coverage_area = geo_dist['coverage_area']
-            message += "🌍 **GEOGRAPHIC DISTRIBUTION:**\n"
-            message += f"• Coverage Area: {coverage_area['approximate_coverage']}\n"
-            message += f"• Center Point: {coverage_area['center_point']}\n"
+            parts.append("🌍 <b>GEOGRAPHIC DISTRIBUTION:</b>\n")
+            parts.append(f"• Coverage Area: {coverage_area['approximate_coverage']}\n")
+            parts.append(f"• Center Point: {coverage_area['center_point']}\n")
             
             zones = geo_dist.get('performance_zones', {})
             if zones:
-                message += f"• Performance Zones:\n"
+                parts.append(f"• Performance Zones:\n")
                 for zone, stats in zones.items():
-                    message += f"  - {zone}: {stats['total_revenue']} ({stats['visit_count']} visits)\n"
-            message += "\n"
+                    parts.append(f"  - {escape(str(zone))}: {stats['total_revenue']} ({stats['visit_count']} visits)\n")
+            parts.append("\n")
         
         # Route Optimization
         route_insights = location_analytics['route_optimization']
@@ -579,48 +764,51 @@ async def location_analytics_command(update: Update, context: ContextTypes.DEFAU
             route_metrics = route_insights['route_metrics']
             optimization = route_insights['optimization_insights']
             
-            message += "🛣️ **ROUTE OPTIMIZATION:**\n"
-            message += f"• Total Distance: {route_metrics['total_distance_covered']}\n"
-            message += f"• Avg Distance/Visit: {route_metrics['average_distance_between_visits']}\n"
-            message += f"• Efficiency Score: {optimization['efficiency_score']:.0f}%\n"
-            message += f"• Optimization Potential: {optimization['optimization_potential']}\n"
-            message += f"• Recommendation: {optimization['recommendation']}\n\n"
+            parts.append("🛣️ <b>ROUTE OPTIMIZATION:</b>\n")
+            parts.append(f"• Total Distance: {route_metrics['total_distance_covered']}\n")
+            parts.append(f"• Avg Distance/Visit: {route_metrics['average_distance_between_visits']}\n")
+            parts.append(f"• Efficiency Score: {optimization['efficiency_score']:.0f}%\n")
+            parts.append(f"• Optimization Potential: {optimization['optimization_potential']}\n")
+            parts.append(f"• Recommendation: {optimization['recommendation']}\n\n")
         
         # Location Trends
         trends = location_analytics['location_trends']
         if 'trending_locations' in trends:
             trending = trends['trending_locations']
             if trending.get('growing'):
-                message += "📈 **TRENDING LOCATIONS:**\n"
-                message += "Growing:\n"
-                for location, trend in list(trending['growing'].items())[:2]:
-                    message += f"  • {location}: {trend}\n"
+                parts.append("📈 <b>TRENDING LOCATIONS:</b>\n")
+                parts.append("Growing:\n")
+                for location, trend in islice(trending['growing'].items(), 2):
+                    parts.append(f"  • {escape(str(location))}: {trend}\n")
             
             gps_adoption = trends.get('gps_adoption', {})
             if gps_adoption:
-                message += f"\n📍 **GPS Adoption:** {gps_adoption['trend']} ({gps_adoption['current_rate']})\n"
-                message += f"💡 {gps_adoption['recommendation']}\n"
+                parts.append(f"\n📍 <b>GPS Adoption:</b> {gps_adoption['trend']} ({gps_adoption['current_rate']})\n")
+                parts.append(f"💡 {gps_adoption['recommendation']}\n")
         
         # AI Recommendations
         if coverage_pct < 80:
-            message += f"\n🤖 **AI RECOMMENDATION:**\n"
-            message += f"Share your GPS location more frequently to unlock:\n"
-            message += f"• Advanced territory insights\n"
-            message += f"• Route optimization suggestions\n"
-            message += f"• Geographic performance analysis\n"
+            parts.append(f"\n🤖 <b>AI RECOMMENDATION:</b>\n")
+            parts.append(f"Share your GPS location more frequently to unlock:\n")
+            parts.append(f"• Advanced territory insights\n")
+            parts.append(f"• Route optimization suggestions\n")
+            parts.append(f"• Geographic performance analysis\n")
         else:
-            message += f"\n🎉 **EXCELLENT GPS COVERAGE!**\n"
-            message += f"Your territory data enables advanced business intelligence.\n"
+            parts.append(f"\n🎉 <b>EXCELLENT GPS COVERAGE!</b>\n")
+            parts.append(f"Your territory data enables advanced business intelligence.\n")
         
         # Add motivational AI message
         motivation = ai_response_engine.generate_motivation_message()
-        message += f"\n💪 {motivation}"
+        parts.append(f"\n💪 {escape(motivation)}")
         
-        await loading_msg.edit_text(message, parse_mode='Markdown')
+        await _send_analytics_message(update, loading_msg, ''.join(parts), parse_mode=ParseMode.HTML)
         logger.info(f"📍 Enhanced location analytics delivered to user {user.id}")
         
+        # /top and /dashboard usually follow; warm the dashboard while the user reads
+        _prefetch_report(context, user.id, 'dashboard', analytics_engine.generate_executive_dashboard)
+        
     except Exception as e:
-        await loading_msg.edit_text("❌ Failed to generate location analytics. Please try again.")
+        await _send_analytics_message(update, loading_msg, "❌ Failed to generate location analytics. Please try again.")
         logger.error(f"Location analytics command error: {e}")
 
 @rate_limit(calls_per_minute=3)
@@ -637,10 +825,8 @@ async def dashboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     loading_msg = await update.message.reply_text("📊 AI is generating your executive dashboard with location intelligence...")
     
     try:
-        from analytics import AdvancedAnalytics
-        analytics_engine = AdvancedAnalytics()
-        
         # Generate executive dashboard
+        await _await_prefetched_report(user.id, 'dashboard')
         dashboard_data = analytics_engine.generate_executive_dashboard(user.id)
         
         if "error" in dashboard_data:
@@ -743,62 +929,18 @@ async def dashboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @rate_limit(calls_per_minute=5)
 @handle_errors(notify_user=True) 
+@require_registration
 async def analytics_help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """📚 AI-Enhanced Analytics Help"""
     user = update.effective_user
     logger.info(f"📚 Analytics help requested by user {user.id}")
     
-    if not company_manager.is_user_registered(user.id):
-        await update.message.reply_text("❌ Please register with a company first using `/company`")
-        return
-    
-    current_company = company_manager.get_user_company(user.id)
-    company_info = company_manager.get_company_info(current_company)
+    company_info = context.user_data['_company_info']
     
-    help_text = f"""
-📚 **AI-ENHANCED ANALYTICS COMMANDS**
-🏢 **Current Company:** {company_info['display_name']}
-
-🤖 **AI-POWERED EXECUTIVE LEVEL:**
-• `/dashboard` - AI-enhanced business overview with intelligent insights
-• `/predictions` - Machine learning forecasts & predictive analytics
-
-📊 **INTELLIGENT VISUAL ANALYTICS:**  
-• `/charts` - AI-generated professional charts with parallel processing
-• `/trends` - Smart revenue & performance trend analysis
-
-📍 **GPS TERRITORY INTELLIGENCE:**
-• `/location_analytics` - AI territory insights with GPS data analysis
-• `/location` - Share GPS for intelligent territory tracking
-
-📈 **PERFORMANCE TRACKING:**
-• `/today` - AI-enhanced daily performance with insights
-• `/week` - Weekly analysis with trend intelligence  
-• `/month` - Comprehensive monthly review with predictions
-
-🔍 **QUICK AI INSIGHTS:**
-• `/top` - AI-ranked top clients & locations with performance analysis
-• Natural language queries - "Show me sales trends" (coming soon)
-
-🚀 **AI FEATURES:**
-• 🧠 Natural language processing for entries
-• 📍 GPS location intelligence and territory optimization  
-• ⚡ Parallel processing for faster analytics
-• 🔮 Predictive insights and forecasting
-• 📊 Automated chart generation with AI insights
-• 🤖 Intelligent recommendations and tips
-
-💡 **PRO AI TIPS:**
-• Use natural language: "Sold 5 tablets to Apollo for ₹25000"
-• Share GPS location for territory intelligence
-• Enable batch processing for multiple entries
-• All analytics update automatically with AI enhancement!
-
-🎯 **Example Usage:**
-Just type `/dashboard` and get instant AI-powered business insights!
-
-{ai_response_engine.generate_tip_of_the_day()}
-    """
+    help_text = _ANALYTICS_HELP_TEMPLATE.format(
+        display_name=company_info['display_name'],
+        tip=ai_response_engine.generate_tip_of_the_day()
+    )
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
     logger.info(f"📚 AI-enhanced analytics help delivered to user {user.id}")
@@ -817,8 +959,7 @@ async def top_performers_command(update: Update, context: ContextTypes.DEFAULT_T
     loading_msg = await update.message.reply_text("🏆 AI is analyzing top performers with intelligent ranking...")
     
     try:
-        from analytics import analytics_engine
-        
+        await _await_prefetched_report(user.id, 'dashboard')
         dashboard = analytics_engine.generate_executive_dashboard(user.id)
         
         if "error" in dashboard:
@@ -917,50 +1058,55 @@ Try saying: "Sold 10 medicines to City Hospital for ₹15000 urgent delivery"
     await update.message.reply_text(help_text, parse_mode='Markdown')
 @rate_limit(calls_per_minute=5)
 @handle_errors(notify_user=True)
+@require_registration
 async def top_performers_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """🏆 Top Performers Analysis with Location Intelligence"""
     user = update.effective_user
     logger.info(f"🏆 Top performers requested by user {user.id}")
     
-    if not company_manager.is_user_registered(user.id):
-        await update.message.reply_text("❌ Please register with a company first using `/company`")
-        return
-    
-    loading_msg = await update.message.reply_text("🏆 AI is analyzing top performers with location intelligence...")
+    # Skip the placeholder round-trip when the user's data is already cached
+    loading_msg = None
+    if not analytics_engine.has_cached_data(user.id):
+        loading_msg = await update.message.reply_text("🏆 Analyzing...")
     
     try:
-        from analytics import AdvancedAnalytics
-        analytics_engine = AdvancedAnalytics()
-        
         # Get dashboard data for top performers
+        await _await_prefetched_report(user.id, 'dashboard')
         dashboard_data = analytics_engine.generate_executive_dashboard(user.id)
-        location_data = analytics_engine.generate_location_analytics(user.id)
         
         if "error" in dashboard_data:
-            await loading_msg.edit_text(f"❌ {dashboard_data['error']}")
+            await _send_analytics_message(update, loading_msg, f"❌ {dashboard_data['error']}")
+            return
+        
+        top_clients = dashboard_data.get('top_clients', {})
+        top_locations = dashboard_data.get('top_locations', {})
+        
+        # Nothing to rank yet - skip location analytics and insight building
+        if not top_clients and not top_locations:
+            await _send_analytics_message(update, loading_msg, _EMPTY_TOP_PERFORMERS_TEXT, parse_mode=ParseMode.HTML)
             return
         
-        message = "🏆 **TOP PERFORMERS ANALYSIS**\n\n"
+        location_data = analytics_engine.generate_location_analytics(user.id)
+        
+        parts = ["🏆 <b>TOP PERFORMERS ANALYSIS</b>\n\n"]
         
         # Top Clients
-        top_clients = dashboard_data.get('top_clients', {})
         if top_clients:
-            message += "👥 **TOP CLIENTS BY REVENUE:**\n"
-            for i, (client, revenue) in enumerate(list(top_clients.items())[:5], 1):
+            parts.append("👥 <b>TOP CLIENTS BY REVENUE:</b>\n")
+            for i, (client, revenue) in enumerate(islice(top_clients.items(), 5), 1):
                 performance_emoji = "🔥" if revenue > 50000 else "⭐" if revenue > 25000 else "📈"
-                message += f"{i}. {performance_emoji} **{client}**\n"
-                message += f"   💰 Revenue: ₹{revenue:,.0f}\n"
-            message += "\n"
+                parts.append(f"{i}. {performance_emoji} <b>{escape(str(client))}</b>\n")
+                parts.append(f"   💰 Revenue: ₹{revenue:,.0f}\n")
+            parts.append("\n")
         
         # Top Locations
-        top_locations = dashboard_data.get('top_locations', {})
         if top_locations:
-            message += "📍 **TOP LOCATIONS BY REVENUE:**\n"
-            for i, (location, revenue) in enumerate(list(top_locations.items())[:5], 1):
+            parts.append("📍 <b>TOP LOCATIONS BY REVENUE:</b>\n")
+            for i, (location, revenue) in enumerate(islice(top_locations.items(), 5), 1):
                 performance_emoji = "🎯" if revenue > 40000 else "📍" if revenue > 20000 else "💡"
-                message += f"{i}. {performance_emoji} **{location}**\n"
-                message += f"   💰 Revenue: ₹{revenue:,.0f}\n"
-            message += "\n"
+                parts.append(f"{i}. {performance_emoji} <b>{escape(str(location))}</b>\n")
+                parts.append(f"   💰 Revenue: ₹{revenue:,.0f}\n")
+            parts.append("\n")
         
         # Territory Performance (if GPS data available)
         if "error" not in location_data:
@@ -968,143 +1114,65 @@ async def top_performers_command(update: Update, context: ContextTypes.DEFAULT_T
             territory_rankings = territory_perf.get('territory_rankings', {})
             
             if territory_rankings:
-                message += "🗺️ **TOP TERRITORIES (GPS ENHANCED):**\n"
-                for i, (location, stats) in enumerate(list(territory_rankings.items())[:3], 1):
-                    efficiency_emoji = "🔥" if stats['efficiency_score'] > 20000 else "⚡" if stats['efficiency_score'] > 10000 else "📊"
-                    message += f"{i}. {efficiency_emoji} **{location}**\n"
-                    message += f"   💰 {stats['revenue']} | 📍 {stats['visits']} visits\n"
-                    message += f"   👥 {stats['clients']} clients | ⚡ ₹{stats['efficiency_score']}/visit\n"
-                message += "\n"
+                parts.append("🗺️ <b>TOP TERRITORIES (GPS ENHANCED):</b>\n")
+                for i, (location, stats) in enumerate(islice(territory_rankings.items(), 3), 1):
+                    score = stats['efficiency_score']
+                    efficiency_emoji = "🔥" if score > 20000 else "⚡" if score > 10000 else "📊"
+                    parts.append(f"{i}. {efficiency_emoji} <b>{escape(str(location))}</b>\n")
+                    parts.append(f"   💰 {stats['revenue']} | 📍 {stats['visits']} visits\n")
+                    parts.append(f"   👥 {stats['clients']} clients | ⚡ ₹{score}/visit\n")
+                parts.append("\n")
         
         # Performance Insights
         insights = dashboard_data.get('insights', {})
-        message += "🧠 **PERFORMANCE INSIGHTS:**\n"
-        message += f"🔄 Client Retention Score: **{insights.get('client_retention_score', 'N/A')}**\n"
-        message += f"⚡ Location Efficiency Score: **{insights.get('location_efficiency_score', 'N/A')}**\n"
-        message += f"📊 Revenue Concentration: **{insights.get('revenue_concentration', 'N/A')}**\n\n"
+        retention = insights.get('client_retention_score', 'N/A')
+        efficiency = insights.get('location_efficiency_score', 'N/A')
+        concentration = insights.get('revenue_concentration', 'N/A')
+        parts.append(
+            "🧠 <b>PERFORMANCE INSIGHTS:</b>\n"
+            f"🔄 Client Retention Score: <b>{retention}</b>\n"
+            f"⚡ Location Efficiency Score: <b>{efficiency}</b>\n"
+            f"📊 Revenue Concentration: <b>{concentration}</b>\n\n"
+        )
         
         # AI Recommendations
-        message += "🤖 **AI RECOMMENDATIONS:**\n"
+        parts.append("🤖 <b>AI RECOMMENDATIONS:</b>\n")
         if top_clients:
-            top_client_revenue = list(top_clients.values())[0]
+            top_client_revenue = next(iter(top_clients.values()))
             if top_client_revenue > 100000:
-                message += "• Focus on maintaining your top client relationships\n"
+                parts.append("• Focus on maintaining your top client relationships\n")
             else:
-                message += "• Consider strategies to grow your top client accounts\n"
+                parts.append("• Consider strategies to grow your top client accounts\n")
         
         if "error" not in location_data:
             gps_coverage = location_data.get('gps_coverage', {}).get('coverage_percentage', 0)
             if gps_coverage < 70:
-                message += "• Share GPS location to identify high-performing territories\n"
+                parts.append("• Share GPS location to identify high-performing territories\n")
             else:
-                message += "• Leverage territory insights for expansion planning\n"
+                parts.append("• Leverage territory insights for expansion planning\n")
         
         # Add motivational message
         motivation = ai_response_engine.generate_motivation_message()
-        message += f"\n💪 {motivation}"
+        parts.append(f"\n💪 {escape(motivation)}")
         
-        await loading_msg.edit_text(message, parse_mode='Markdown')
+        await _send_analytics_message(update, loading_msg, ''.join(parts), parse_mode=ParseMode.HTML)
         logger.info(f"🏆 Top performers analysis delivered to user {user.id}")
         
     except Exception as e:
-        await loading_msg.edit_text("❌ Failed to generate top performers analysis. Please try again.")
+        await _send_analytics_message(update, loading_msg, "❌ Failed to generate top performers analysis. Please try again.")
         logger.error(f"Top performers command error: {e}")
 
 @rate_limit(calls_per_minute=10)
 @handle_errors(notify_user=True)
+@require_registration
 async def ai_help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """🤖 AI Features Help and Guidance"""
     user = update.effective_user
     logger.info(f"🤖 AI help requested by user {user.id}")
     
-    if not company_manager.is_user_registered(user.id):
-        await update.message.reply_text("❌ Please register with a company first using `/company`")
-        return
+    company_info = context.user_data['_company_info']
     
-    current_company = company_manager.get_user_company(user.id)
-    company_info = company_manager.get_company_info(current_company)
-    
-    help_text = f"""
-🤖 **AI-POWERED PERFORMANCE TRACKER**
-🏢 **Current Company:** {company_info['display_name']}
-
-🧠 **ARTIFICIAL INTELLIGENCE FEATURES:**
-
-📝 **NATURAL LANGUAGE PROCESSING:**
-• Smart entry parsing - just describe your sale naturally
-• Example: "Sold 5 tablets to Apollo Pharmacy for ₹25000"
-• AI understands context, quantities, and amounts
-• Automatic error correction and validation
-
-📍 **LOCATION INTELLIGENCE:**
-• GPS-powered territory analytics
-• Automatic location tagging for sales entries
-• Route optimization suggestions
-• Geographic performance insights
-• Territory trend analysis
-
-🔮 **PREDICTIVE ANALYTICS:**
-• AI-powered sales forecasting
-• Trend prediction and analysis
-• Performance pattern recognition
-• Growth opportunity identification
-
-📊 **INTELLIGENT DASHBOARDS:**
-• Real-time business intelligence
-• AI-generated insights and recommendations
-• Performance benchmarking
-• Automated report generation
-
-⚡ **ADVANCED PROCESSING:**
-• Parallel processing for faster analytics
-• Batch entry processing for multiple sales
-• Smart data validation and cleanup
-• Automated chart generation
-
-🎯 **SMART RECOMMENDATIONS:**
-• Personalized business insights
-• Territory optimization suggestions
-• Client relationship recommendations
-• Performance improvement tips
-
-🚀 **HOW TO USE AI FEATURES:**
-
-1️⃣ **Natural Language Entries:**
-   Just type: "Sold 10 medicines to City Hospital for ₹15000"
-   AI will parse: Client, Location, Orders, Amount automatically
-
-2️⃣ **GPS Location Sharing:**
-   Use `/location` to share GPS for territory insights
-   AI will enhance all future entries with location data
-
-3️⃣ **AI Analytics:**
-   • `/dashboard` - AI-powered executive overview
-   • `/predictions` - Machine learning forecasts
-   • `/location_analytics` - Territory intelligence
-
-4️⃣ **Batch Processing:**
-   Enter multiple sales at once, AI will process them all
-
-💡 **PRO AI TIPS:**
-• Be descriptive in your entries for better AI parsing
-• Share GPS location regularly for territory insights
-• Use natural language - AI understands context
-• Check `/predictions` for growth opportunities
-• Review `/location_analytics` for territory optimization
-
-🔬 **AI TECHNOLOGY STACK:**
-• Google Gemini 2.5 Flash for natural language processing
-• Advanced analytics engine with machine learning
-• GPS coordinate processing and geocoding
-• Parallel processing for high performance
-• Intelligent caching for faster responses
-
-🎉 **GETTING STARTED:**
-Try saying: "I sold 3 boxes of medicine to Metro Hospital for ₹12000"
-The AI will automatically understand and log your sale!
-
-💪 **Remember:** The more you use AI features, the smarter the system becomes at understanding your business patterns!
-"""
+    help_text = _AI_HELP_TEMPLATE.format(display_name=company_info['display_name'])
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
     logger.info(f"🤖 AI help delivered to user {user.id}")
\ No newline at end of file
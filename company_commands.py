@@ -5,12 +5,33 @@ Handle company selection, switching, and admin management
 """
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from company_manager import company_manager
 from multi_company_sheets import multi_sheet_manager
-from decorators import handle_errors, rate_limit
+from decorators import guarded
 from logger import logger
-from typing import Dict, List
+from typing import Dict, List, Optional
+import html
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import weakref
+
+# Max simultaneous Google Sheets stats requests from admin commands
+STATS_FETCH_CONCURRENCY = 4
+
+# Company callbacks run as non-blocking tasks; one lock per chat keeps each
+# chat's button presses in order while other chats proceed concurrently.
+# Weak values: a chat's lock disappears once no callback holds or awaits it.
+_chat_callback_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# Stats fetches currently running, shared by concurrent callers: {company_key: future}
+_stats_in_flight: Dict[str, asyncio.Future] = {}
+
+# User-mapping changes save JSON to disk; they run on one worker thread so they
+# stay off the event loop and never overlap each other
+_mapping_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="company-mappings")
 
 # ═══════════════════════════════════════════════════════════════
 # 🛡️ SAFE FORMATTING FUNCTIONS
@@ -48,9 +69,9 @@ def safe_format_revenue(revenue_value) -> str:
         logger.warning(f"⚠️ Could not format revenue '{revenue_value}': {e}")
         return f"₹{revenue_value}"
 
-def escape_markdown_safely(text) -> str:
+def escape_html_safely(text) -> str:
     """
-    🛡️ Safely escape markdown characters in text.
+    🛡️ Safely escape text for HTML parse mode.
     
     Args:
         text: Text to escape (any type)
@@ -61,11 +82,7 @@ def escape_markdown_safely(text) -> str:
     if text is None:
         return "N/A"
     
-    text_str = str(text)
-    # Escape markdown special characters
-    escaped = text_str.replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
-    escaped = escaped.replace("[", "\\[").replace("]", "\\]").replace("(", "\\(").replace(")", "\\)")
-    return escaped
+    return html.escape(str(text))
 
 def safe_format_number(value, default=0) -> int:
     """
@@ -91,12 +108,116 @@ def safe_format_number(value, default=0) -> int:
     except (ValueError, TypeError):
         return default
 
+def paginate_message_parts(parts: List[str], max_chars: int = 3800) -> List[str]:
+    """
+    📄 Group message blocks into pages that fit in one Telegram message.
+    Blocks are never split; a page is flushed before it would exceed max_chars.
+    
+    Args:
+        parts: Message blocks in display order
+        max_chars: Page size limit (below Telegram's 4096 to leave headroom)
+        
+    Returns:
+        List[str]: Joined pages
+    """
+    pages = []
+    page = []
+    page_len = 0
+    
+    for part in parts:
+        if page and page_len + len(part) > max_chars:
+            pages.append(''.join(page))
+            page = []
+            page_len = 0
+        page.append(part)
+        page_len += len(part)
+    
+    if page:
+        pages.append(''.join(page))
+    return pages
+
+async def run_mapping_update(func, *args) -> bool:
+    """💾 Run a company_manager mutation on the mapping writer thread"""
+    return await asyncio.get_running_loop().run_in_executor(_mapping_writer, func, *args)
+
+async def fetch_company_stats(company_key: str) -> Dict:
+    """
+    📈 Fetch company stats off the event loop.
+    Concurrent callers for the same company share a single sheet read.
+    
+    Args:
+        company_key: Company to fetch stats for
+        
+    Returns:
+        Dict: Stats from multi_sheet_manager.get_company_stats (treat as read-only)
+    """
+    future = _stats_in_flight.get(company_key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(
+            None, multi_sheet_manager.get_company_stats, company_key
+        )
+        _stats_in_flight[company_key] = future
+        future.add_done_callback(lambda _: _stats_in_flight.pop(company_key, None))
+    
+    # Shield so one cancelled caller doesn't cancel the fetch for the others
+    return await asyncio.shield(future)
+
+# ═══════════════════════════════════════════════════════════════
+# 📝 STATIC TEXT & KEYBOARDS (companies are fixed, so built once at import)
+# ═══════════════════════════════════════════════════════════════
+
+AVAILABLE_COMPANY_KEYS = ', '.join(company_manager.get_all_companies())
+
+COMPANY_DISPLAY_NAMES = {
+    company_key: company_info['display_name']
+    for company_key, company_info in company_manager.COMPANIES.items()
+}
+
+ADMIN_PANEL_TEXT = (
+    "👑 <b>ADMIN PANEL</b>\n\n"
+    "🏢 <b>Company Management:</b>\n"
+    "• <code>/admin_users</code> - View all users\n"
+    "• <code>/admin_assign &lt;user_id&gt; &lt;company&gt;</code> - Assign user to company\n"
+    "• <code>/admin_remove &lt;user_id&gt; &lt;company&gt;</code> - Remove user from company\n"
+    "• <code>/admin_stats</code> - Company statistics\n\n"
+    "📊 <b>Available Companies:</b>\n"
+) + ''.join(
+    f"• <code>{company_key}</code> - {company_info['display_name']}\n"
+    for company_key, company_info in company_manager.get_all_companies().items()
+)
+
+# Registration menu is the same for every user
+REGISTRATION_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton(company_info['display_name'], callback_data=f"cr{company_manager.get_company_id(company_key)}")]
+    for company_key, company_info in company_manager.get_all_companies().items()
+])
+
+@lru_cache(maxsize=64)
+def build_switching_keyboard(current_company: Optional[str], allowed_companies: frozenset) -> InlineKeyboardMarkup:
+    """🔄 Build (and memoize) the switching keyboard for a current/allowed combination"""
+    keyboard = [
+        [InlineKeyboardButton(f"➡️ {company_info['display_name']}", callback_data=f"cs{company_manager.get_company_id(company_key)}")]
+        for company_key, company_info in company_manager.get_all_companies().items()
+        if company_key in allowed_companies and company_key != current_company
+    ]
+    
+    # Add current company info button
+    if current_company:
+        keyboard.append([InlineKeyboardButton(
+            f"📊 Current: {company_manager.get_company_display_name(current_company)}", 
+            callback_data=f"ci{company_manager.get_company_id(current_company)}"
+        )])
+    
+    # Add close button
+    keyboard.append([InlineKeyboardButton("❌ Close", callback_data="cx")])
+    
+    return InlineKeyboardMarkup(keyboard)
+
 # ═══════════════════════════════════════════════════════════════
 # 🏢 COMPANY SELECTION COMMANDS
 # ═══════════════════════════════════════════════════════════════
 
-@rate_limit(calls_per_minute=10)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=10)
 async def company_select_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """🏢 Company Selection Menu"""
     user = update.effective_user
@@ -116,24 +237,12 @@ async def show_company_registration_menu(update: Update, context: ContextTypes.D
     user = update.effective_user
     
     text = (
-        f"👋 **Welcome {user.first_name}!**\n\n"
-        "🏢 **Please select your company to get started:**\n\n"
+        f"👋 <b>Welcome {escape_html_safely(user.first_name)}!</b>\n\n"
+        "🏢 <b>Please select your company to get started:</b>\n\n"
         "You'll be able to switch companies later if needed."
     )
     
-    # Create company selection keyboard
-    keyboard = []
-    companies = company_manager.get_all_companies()
-    
-    for company_key, company_info in companies.items():
-        keyboard.append([InlineKeyboardButton(
-            company_info['display_name'], 
-            callback_data=f"register_company_{company_key}"
-        )])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+    await update.message.reply_text(text, reply_markup=REGISTRATION_KEYBOARD, parse_mode=ParseMode.HTML)
     logger.info(f"📝 Sent company registration menu to user {user.id}")
 
 async def show_company_switching_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -145,41 +254,101 @@ async def show_company_switching_menu(update: Update, context: ContextTypes.DEFA
     current_display = company_manager.get_company_display_name(current_company) if current_company else "None"
     
     text = (
-        f"🏢 **Company Management**\n\n"
-        f"📍 **Current Company:** {current_display}\n\n"
-        f"🔄 **Switch to different company:**"
+        f"🏢 <b>Company Management</b>\n\n"
+        f"📍 <b>Current Company:</b> {current_display}\n\n"
+        f"🔄 <b>Switch to different company:</b>"
     )
     
-    # Create switching keyboard
-    keyboard = []
-    companies = company_manager.get_all_companies()
-    
-    for company_key, company_info in companies.items():
-        if company_key in allowed_companies and company_key != current_company:
-            keyboard.append([InlineKeyboardButton(
-                f"➡️ {company_info['display_name']}", 
-                callback_data=f"switch_company_{company_key}"
-            )])
+    reply_markup = build_switching_keyboard(current_company, frozenset(allowed_companies))
     
-    # Add current company info button
-    if current_company:
-        keyboard.append([InlineKeyboardButton(
-            f"📊 Current: {current_display}", 
-            callback_data=f"company_info_{current_company}"
-        )])
-    
-    # Add close button
-    keyboard.append([InlineKeyboardButton("❌ Close", callback_data="close_menu")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
     logger.info(f"🔄 Sent company switching menu to user {user.id}")
 
 # ═══════════════════════════════════════════════════════════════
 # ⚡ CALLBACK HANDLERS
 # ═══════════════════════════════════════════════════════════════
 
+async def _register_company_callback(query, user, company_key: Optional[str]):
+    """📝 Register the user with the selected company"""
+    # Use improved assignment method
+    success = await run_mapping_update(company_manager.assign_user_to_company, user.id, company_key)
+    
+    if success:
+        company_info = company_manager.get_company_info(company_key)
+        await query.edit_message_text(
+            f"✅ <b>Successfully registered!</b>\n\n"
+            f"🏢 <b>Company:</b> {escape_html_safely(company_info['display_name'])}\n"
+            f"👤 <b>User:</b> {escape_html_safely(user.full_name or user.first_name)}\n\n"
+            f"🚀 <b>You can now use all bot features!</b>\n"
+            f"💡 Use <code>/start</code> to begin or <code>/company</code> to switch companies later.",
+            parse_mode=ParseMode.HTML
+        )
+        logger.info(f"✅ User {user.id} registered with company {company_key}")
+    else:
+        await query.edit_message_text(
+            "❌ <b>Registration failed</b>\n\n"
+            "Please try again or contact support if the problem persists.\n\n"
+            "💡 Use <code>/company</code> to try again.",
+            parse_mode=ParseMode.HTML
+        )
+        logger.error(f"❌ Registration failed for user {user.id}")
+
+async def _switch_company_callback(query, user, company_key: Optional[str]):
+    """🔄 Switch the user to the selected company"""
+    success = await run_mapping_update(company_manager.switch_user_company, user.id, company_key)
+    
+    if success:
+        company_info = company_manager.get_company_info(company_key)
+        await query.edit_message_text(
+            f"🔄 <b>Company switched successfully!</b>\n\n"
+            f"🏢 <b>New Company:</b> {escape_html_safely(company_info['display_name'])}\n"
+            f"📊 <b>All analytics and data will now show {escape_html_safely(company_info['name'])} information.</b>\n\n"
+            f"💡 Try <code>/dashboard</code> to see your new company dashboard!",
+            parse_mode=ParseMode.HTML
+        )
+        logger.info(f"🔄 User {user.id} switched to company {company_key}")
+    else:
+        await query.edit_message_text(
+            "❌ <b>Company switch failed</b>\n\n"
+            "This could be due to:\n"
+            "• Invalid company selection\n"
+            "• Access permissions\n"
+            "• Temporary system issue\n\n"
+            "💡 Try <code>/company</code> again or contact support.",
+            parse_mode=ParseMode.HTML
+        )
+        logger.error(f"❌ Company switch failed for user {user.id}")
+
+async def _company_info_callback(query, user, company_key: Optional[str]):
+    """📊 Show statistics for the selected company"""
+    company_info = company_manager.get_company_info(company_key)
+    stats = await fetch_company_stats(company_key)
+    
+    info_text = (
+        f"📊 <b>{escape_html_safely(company_info['display_name'])} Information</b>\n\n"
+        f"📈 <b>Statistics:</b>\n"
+        f"• Records: {safe_format_number(stats.get('total_records', 0))}\n"
+        f"• Users: {safe_format_number(stats.get('total_users', 0))}\n"
+        f"• Revenue: {safe_format_revenue(stats.get('total_revenue', 0))}\n"
+        f"• Period: {escape_html_safely(stats.get('date_range', 'No data'))}\n\n"
+        f"🔧 <b>Sheet:</b> {escape_html_safely(company_info.get('sheet_name', 'N/A'))}"
+    )
+    
+    await query.edit_message_text(info_text, parse_mode=ParseMode.HTML)
+
+async def _close_menu_callback(query, user, company_key: Optional[str]):
+    """❌ Close the company menu"""
+    await query.edit_message_text("👍 Menu closed.")
+
+# Callback data is "c" + one action letter + numeric company id, e.g. "cr0", "cs2", "cx"
+COMPANY_CALLBACK_PATTERN = r"^c[rsix]\d*$"
+COMPANY_CALLBACK_HANDLERS = {
+    "r": _register_company_callback,
+    "s": _switch_company_callback,
+    "i": _company_info_callback,
+    "x": _close_menu_callback,
+}
+
 async def handle_company_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """⚡ Handle company selection callbacks"""
     query = update.callback_query
@@ -189,89 +358,29 @@ async def handle_company_callback(update: Update, context: ContextTypes.DEFAULT_
     logger.info(f"⚡ Company callback: {data} from user {user.id}")
     
     try:
-        if data.startswith("register_company_"):
-            company_key = data.replace("register_company_", "")
-            
-            # Use improved assignment method
-            success = company_manager.assign_user_to_company(user.id, company_key)
-            
-            if success:
-                company_info = company_manager.get_company_info(company_key)
-                await query.edit_message_text(
-                    f"✅ **Successfully registered!**\n\n"
-                    f"🏢 **Company:** {escape_markdown_safely(company_info['display_name'])}\n"
-                    f"👤 **User:** {escape_markdown_safely(user.full_name or user.first_name)}\n\n"
-                    f"🚀 **You can now use all bot features!**\n"
-                    f"💡 Use `/start` to begin or `/company` to switch companies later.",
-                    parse_mode='Markdown'
-                )
-                logger.info(f"✅ User {user.id} registered with company {company_key}")
-            else:
-                await query.edit_message_text(
-                    "❌ **Registration failed**\n\n"
-                    "Please try again or contact support if the problem persists.\n\n"
-                    "💡 Use `/company` to try again."
-                )
-                logger.error(f"❌ Registration failed for user {user.id}")
-        
-        elif data.startswith("switch_company_"):
-            company_key = data.replace("switch_company_", "")
-            success = company_manager.switch_user_company(user.id, company_key)
-            
-            if success:
-                company_info = company_manager.get_company_info(company_key)
-                await query.edit_message_text(
-                    f"🔄 **Company switched successfully!**\n\n"
-                    f"🏢 **New Company:** {escape_markdown_safely(company_info['display_name'])}\n"
-                    f"📊 **All analytics and data will now show {escape_markdown_safely(company_info['name'])} information.**\n\n"
-                    f"💡 Try `/dashboard` to see your new company dashboard!",
-                    parse_mode='Markdown'
-                )
-                logger.info(f"🔄 User {user.id} switched to company {company_key}")
-            else:
-                await query.edit_message_text(
-                    "❌ **Company switch failed**\n\n"
-                    "This could be due to:\n"
-                    "• Invalid company selection\n"
-                    "• Access permissions\n"
-                    "• Temporary system issue\n\n"
-                    "💡 Try `/company` again or contact support."
-                )
-                logger.error(f"❌ Company switch failed for user {user.id}")
-        
-        elif data.startswith("company_info_"):
-            company_key = data.replace("company_info_", "")
-            company_info = company_manager.get_company_info(company_key)
-            stats = multi_sheet_manager.get_company_stats(company_key)
-            
-            info_text = (
-                f"📊 **{escape_markdown_safely(company_info['display_name'])} Information**\n\n"
-                f"📈 **Statistics:**\n"
-                f"• Records: {safe_format_number(stats.get('total_records', 0))}\n"
-                f"• Users: {safe_format_number(stats.get('total_users', 0))}\n"
-                f"• Revenue: {safe_format_revenue(stats.get('total_revenue', 0))}\n"
-                f"• Period: {escape_markdown_safely(stats.get('date_range', 'No data'))}\n\n"
-                f"🔧 **Sheet:** {escape_markdown_safely(company_info.get('sheet_name', 'N/A'))}"
-            )
-            
-            await query.edit_message_text(info_text, parse_mode='Markdown')
+        # Stop the client's loading spinner before doing the (possibly slow) work
+        await query.answer()
         
-        elif data == "close_menu":
-            await query.edit_message_text("👍 Menu closed.")
+        chat_id = update.effective_chat.id
+        lock = _chat_callback_locks.get(chat_id)
+        if lock is None:
+            lock = _chat_callback_locks[chat_id] = asyncio.Lock()
         
-        await query.answer()
+        async with lock:
+            handler = COMPANY_CALLBACK_HANDLERS.get(data[1:2])
+            company_key = company_manager.get_company_key_by_id(int(data[2:])) if data[2:] else None
+            if handler:
+                await handler(query, user, company_key)
         
     except Exception as e:
         logger.error(f"❌ Company callback error: {e}")
         await query.edit_message_text("❌ An error occurred. Please try again.")
-        await query.answer()
 
 # ═══════════════════════════════════════════════════════════════
 # 👑 ADMIN COMMANDS
 # ═══════════════════════════════════════════════════════════════
 
-@rate_limit(calls_per_minute=5)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=5)
 async def admin_panel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """👑 Admin Panel"""
     user = update.effective_user
@@ -282,24 +391,9 @@ async def admin_panel_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     logger.info(f"👑 Admin panel accessed by user {user.id}")
     
-    text = (
-        "👑 **ADMIN PANEL**\n\n"
-        "🏢 **Company Management:**\n"
-        "• `/admin_users` - View all users\n"
-        "• `/admin_assign <user_id> <company>` - Assign user to company\n"
-        "• `/admin_remove <user_id> <company>` - Remove user from company\n"
-        "• `/admin_stats` - Company statistics\n\n"
-        "📊 **Available Companies:**\n"
-    )
-    
-    companies = company_manager.get_all_companies()
-    for company_key, company_info in companies.items():
-        text += f"• `{company_key}` - {company_info['display_name']}\n"
-    
-    await update.message.reply_text(text, parse_mode='Markdown')
+    await update.message.reply_text(ADMIN_PANEL_TEXT, parse_mode=ParseMode.HTML)
 
-@rate_limit(calls_per_minute=3)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=3)
 async def admin_users_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """👑 Admin: View all users"""
     user = update.effective_user
@@ -316,27 +410,24 @@ async def admin_users_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("📋 No users registered yet.")
         return
     
-    text = "👥 **ALL REGISTERED USERS:**\n\n"
+    parts = ["👥 <b>ALL REGISTERED USERS:</b>\n\n"]
     
-    for user_id, user_info in all_users.items():
+    # list() grabs the entries in one step, so concurrent registrations can't break iteration
+    for user_id, user_info in list(all_users.items()):
         current_company = user_info.get('current_company', 'None')
-        allowed_companies = ', '.join(user_info.get('allowed_companies', []))
         
-        text += (
-            f"👤 **{user_info.get('user_name', 'Unknown')}** (ID: `{user_id}`)\n"
-            f"🏢 Current: {company_manager.get_company_display_name(current_company)}\n"
-            f"📋 Allowed: {allowed_companies}\n"
-            f"🔧 Role: {user_info.get('role', 'user')}\n\n"
+        parts.append(
+            f"👤 <b>{escape_html_safely(user_info.get('user_name', 'Unknown'))}</b> (ID: <code>{user_id}</code>)\n"
+            f"🏢 Current: {escape_html_safely(COMPANY_DISPLAY_NAMES.get(current_company, current_company))}\n"
+            f"📋 Allowed: {escape_html_safely(', '.join(sorted(user_info.get('allowed_companies', ()))))}\n"
+            f"🔧 Role: {escape_html_safely(user_info.get('role', 'user'))}\n\n"
         )
     
-    # Split message if too long
-    if len(text) > 4000:
-        text = text[:4000] + "...\n\n(Message truncated - too many users)"
-    
-    await update.message.reply_text(text, parse_mode='Markdown')
+    # Send the full list across as many messages as needed (in order)
+    for page in paginate_message_parts(parts):
+        await update.message.reply_text(page, parse_mode=ParseMode.HTML)
 
-@rate_limit(calls_per_minute=3)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=3)
 async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """👑 Admin: Company statistics"""
     user = update.effective_user
@@ -347,44 +438,50 @@ async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     logger.info(f"👑 Admin stats requested by user {user.id}")
     
-    text = "📊 **COMPANY STATISTICS:**\n\n"
+    parts = ["📊 <b>COMPANY STATISTICS:</b>\n\n"]
     
     companies = company_manager.get_all_companies()
     total_records = 0
     total_users = 0
     total_revenue = 0
     
-    for company_key, company_info in companies.items():
-        stats = multi_sheet_manager.get_company_stats(company_key)
-        
+    # Fetch every company's sheet stats concurrently (bounded to respect Sheets quota)
+    semaphore = asyncio.Semaphore(STATS_FETCH_CONCURRENCY)
+    
+    async def fetch_stats(company_key: str) -> Dict:
+        async with semaphore:
+            return await fetch_company_stats(company_key)
+    
+    all_stats = await asyncio.gather(*(fetch_stats(company_key) for company_key in companies))
+    
+    for (company_key, company_info), stats in zip(companies.items(), all_stats):
         if 'error' not in stats:
             company_records = stats.get('total_records', 0)
             company_users = stats.get('total_users', 0) 
             company_revenue = stats.get('total_revenue', 0)
             
-            text += (
-                f"🏢 **{escape_markdown_safely(company_info['display_name'])}**\n"
+            parts.append(
+                f"🏢 <b>{escape_html_safely(company_info['display_name'])}</b>\n"
                 f"📊 Records: {safe_format_number(company_records)}\n"
                 f"👥 Users: {safe_format_number(company_users)}\n"
                 f"💰 Revenue: {safe_format_revenue(company_revenue)}\n"
-                f"📅 Range: {escape_markdown_safely(stats.get('date_range', 'No data'))}\n\n"
+                f"📅 Range: {escape_html_safely(stats.get('date_range', 'No data'))}\n\n"
             )
             
             total_records += company_records
             total_users += company_users  
             total_revenue += company_revenue
     
-    text += (
-        f"📈 **TOTALS ACROSS ALL COMPANIES:**\n"
+    parts.append(
+        f"📈 <b>TOTALS ACROSS ALL COMPANIES:</b>\n"
         f"📊 Total Records: {safe_format_number(total_records)}\n"
-        f"👥 Total Users: {safe_format_number(len(company_manager.user_mappings))}\n"
+        f"👥 Total Users: {company_manager.total_users}\n"
         f"💰 Total Revenue: {safe_format_revenue(total_revenue)}"
     )
     
-    await update.message.reply_text(text, parse_mode='Markdown')
+    await update.message.reply_text(''.join(parts), parse_mode=ParseMode.HTML)
 
-@rate_limit(calls_per_minute=2)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=2)
 async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """👑 Admin: Assign user to company"""
     user = update.effective_user
@@ -393,11 +490,12 @@ async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("❌ Access denied. Admin privileges required.")
         return
     
-    if len(context.args) != 2:
+    if len(context.args) < 2:
         await update.message.reply_text(
-            "❌ **Usage:** `/admin_assign <user_id> <company_key>`\n\n"
-            "**Example:** `/admin_assign 123456789 johnlee`\n\n"
-            "**Available companies:** johnlee, yugrow, ambica, baker"
+            "❌ <b>Usage:</b> <code>/admin_assign &lt;user_id&gt; &lt;company_key&gt;</code>\n\n"
+            "<b>Example:</b> <code>/admin_assign 123456789 johnlee</code>\n\n"
+            f"<b>Available companies:</b> {AVAILABLE_COMPANY_KEYS}",
+            parse_mode=ParseMode.HTML
         )
         return
     
@@ -405,16 +503,18 @@ async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYP
         target_user_id = int(context.args[0])
         company_key = context.args[1].lower()
         
-        success = company_manager.admin_assign_user(user.id, target_user_id, company_key)
+        success = await run_mapping_update(
+            company_manager.admin_assign_user_to_company, user.id, target_user_id, company_key
+        )
         
         if success:
             company_info = company_manager.get_company_info(company_key)
             await update.message.reply_text(
-                f"✅ **User Assignment Successful**\n\n"
-                f"👤 **User ID:** `{target_user_id}`\n"
-                f"🏢 **Company:** {company_info['display_name']}\n\n"
+                f"✅ <b>User Assignment Successful</b>\n\n"
+                f"👤 <b>User ID:</b> <code>{target_user_id}</code>\n"
+                f"🏢 <b>Company:</b> {company_info['display_name']}\n\n"
                 f"The user can now access {company_info['name']} data and analytics.",
-                parse_mode='Markdown'
+                parse_mode=ParseMode.HTML
             )
             logger.info(f"👑 Admin {user.id} assigned user {target_user_id} to company {company_key}")
         else:
@@ -426,63 +526,21 @@ async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYP
         logger.error(f"❌ Admin assign error: {e}")
         await update.message.reply_text("❌ Assignment failed due to an error.")
 
-@rate_limit(calls_per_minute=2)
-@handle_errors(notify_user=True)
+@guarded(calls_per_minute=2)
 async def admin_remove_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """👑 Admin: Remove user from company"""
     user = update.effective_user
     
-    if not company_manager.is_admin(user.id):
-        await update.message.reply_text("❌ Access denied. Admin privileges required.")
-        return
-    
-    if len(context.args) != 2:
-        await update.message.reply_text(
-            "❌ **Usage:** `/admin_remove <user_id> <company_key>`\n\n"
-            "**Example:** `/admin_remove 123456789 johnlee`\n\n"
-            "**Available companies:** johnlee, yugrow, ambica, baker"
-        )
-        return
-    
-    try:
-        target_user_id = int(context.args[0])
-        company_key = context.args[1].lower()
-        
-        success = company_manager.admin_remove_user(user.id, target_user_id, company_key)
-        
-        if success:
-            company_info = company_manager.get_company_info(company_key)
-            await update.message.reply_text(
-                f"✅ **User Removal Successful**\n\n"
-                f"👤 **User ID:** `{target_user_id}`\n"
-                f"🏢 **Company:** {company_info['display_name']}\n\n"
-                f"The user can no longer access {company_info['name']} data.",
-                parse_mode='Markdown'
-            )
-            logger.info(f"👑 Admin {user.id} removed user {target_user_id} from company {company_key}")
-        else:
-            await update.message.reply_text("❌ Removal failed. Please check user ID and company key.")
-    
-    except ValueError:
-        await update.message.reply_text("❌ Invalid user ID. Must be a number.")
-    except Exception as e:
-        logger.error(f"❌ Admin remove error: {e}")
-        await update.message.reply_text("❌ Removal failed due to an error.")
-
-@rate_limit(calls_per_minute=2)
-@handle_errors(notify_user=True)
-async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """👑 Admin: Assign user to company"""
-    user = update.effective_user
-    
     if not company_manager.is_admin(user.id):
         await update.message.reply_text("❌ Access denied. Admin privileges required.")
         return
     
     if len(context.args) < 2:
         await update.message.reply_text(
-            "❌ **Usage:** `/admin_assign <user_id> <company_key>`\n\n"
-            "**Available companies:** johnlee, yugrow, ambica, baker"
+            "❌ <b>Usage:</b> <code>/admin_remove &lt;user_id&gt; &lt;company_key&gt;</code>\n\n"
+            "<b>Example:</b> <code>/admin_remove 123456789 johnlee</code>\n\n"
+            f"<b>Available companies:</b> {AVAILABLE_COMPANY_KEYS}",
+            parse_mode=ParseMode.HTML
         )
         return
     
@@ -490,58 +548,18 @@ async def admin_assign_command(update: Update, context: ContextTypes.DEFAULT_TYP
         target_user_id = int(context.args[0])
         company_key = context.args[1].lower()
         
-        success = company_manager.admin_assign_user(user.id, target_user_id, company_key)
-        
-        if success:
-            company_info = company_manager.get_company_info(company_key)
-            await update.message.reply_text(
-                f"✅ **User Assignment Successful**\n\n"
-                f"👤 **User ID:** `{target_user_id}`\n"
-                f"🏢 **Company:** {company_info['display_name']}\n\n"
-                f"The user can now access {company_info['name']} data.",
-                parse_mode='Markdown'
-            )
-            logger.info(f"👑 Admin {user.id} assigned user {target_user_id} to company {company_key}")
-        else:
-            await update.message.reply_text("❌ Assignment failed. Please check user ID and company key.")
-    
-    except ValueError:
-        await update.message.reply_text("❌ Invalid user ID. Must be a number.")
-    except Exception as e:
-        logger.error(f"❌ Admin assign error: {e}")
-        await update.message.reply_text("❌ Assignment failed due to an error.")
-
-@rate_limit(calls_per_minute=2)
-@handle_errors(notify_user=True)
-async def admin_remove_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """👑 Admin: Remove user from company"""
-    user = update.effective_user
-    
-    if not company_manager.is_admin(user.id):
-        await update.message.reply_text("❌ Access denied. Admin privileges required.")
-        return
-    
-    if len(context.args) < 2:
-        await update.message.reply_text(
-            "❌ **Usage:** `/admin_remove <user_id> <company_key>`\n\n"
-            "**Available companies:** johnlee, yugrow, ambica, baker"
+        success = await run_mapping_update(
+            company_manager.admin_remove_user_from_company, user.id, target_user_id, company_key, True
         )
-        return
-    
-    try:
-        target_user_id = int(context.args[0])
-        company_key = context.args[1].lower()
-        
-        success = company_manager.admin_remove_user(user.id, target_user_id, company_key)
         
         if success:
             company_info = company_manager.get_company_info(company_key)
             await update.message.reply_text(
-                f"✅ **User Removal Successful**\n\n"
-                f"👤 **User ID:** `{target_user_id}`\n"
-                f"🏢 **Company:** {company_info['display_name']}\n\n"
+                f"✅ <b>User Removal Successful</b>\n\n"
+                f"👤 <b>User ID:</b> <code>{target_user_id}</code>\n"
+                f"🏢 <b>Company:</b> {company_info['display_name']}\n\n"
                 f"The user can no longer access {company_info['name']} data.",
-                parse_mode='Markdown'
+                parse_mode=ParseMode.HTML
             )
             logger.info(f"👑 Admin {user.id} removed user {target_user_id} from company {company_key}")
         else:
@@ -5,12 +5,66 @@ Handles company selection, user assignments, and admin controls
 for JohnLee, Yugrow Pharmacy, Ambica Pharma, Baker and Davis
 """
 
+import atexit
+import contextlib
+import copy
 import json
+import mmap
 import os
-from typing import Dict, List, Optional, Set
+import sys
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
 from datetime import datetime
 from logger import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_default(obj):
+    """🔧 Serialize in-memory sets (allowed_companies) as sorted lists"""
+    if isinstance(obj, set):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(obj, pretty: bool = False) -> bytes:
+    """🔧 Serialize to JSON bytes (orjson when available)"""
+    if orjson:
+        # OPT_NON_STR_KEYS writes the int user-id keys as JSON strings
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_json_default, option=option)
+    return json.dumps(obj, default=_json_default, indent=2 if pretty else None).encode()
+
+def _migrate_timestamps(user_data: Dict):
+    """🕒 Convert legacy ISO created_date/last_switched strings to epoch-second fields"""
+    for old_key, new_key in (("created_date", "created_ts"), ("last_switched", "last_switched_ts")):
+        value = user_data.pop(old_key, None)
+        if value and new_key not in user_data:
+            try:
+                user_data[new_key] = int(datetime.fromisoformat(value).timestamp())
+            except (TypeError, ValueError):
+                user_data[new_key] = 0
+
+def _fsync_dir(path: str):
+    """💾 Persist a rename by syncing its directory (no-op where unsupported, e.g. Windows)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# Set DEBUG_PRETTY_JSON=1 to keep the mappings file indented for hand inspection
+PRETTY_JSON = os.getenv("DEBUG_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+
 class CompanyManager:
     """🏢 Company Management System"""
     
@@ -46,6 +100,14 @@ class CompanyManager:
         }
     }
     
+    # Company keys for membership checks
+    COMPANY_KEYS = frozenset(COMPANIES)
+    
+    # Precomputed read-only views of COMPANIES (toggling "active" at runtime is not supported)
+    _ACTIVE_COMPANIES = MappingProxyType({k: v for k, v in COMPANIES.items() if v.get("active", True)})
+    _DISPLAY_NAMES = {k: v["display_name"] for k, v in COMPANIES.items()}
+    _SHEET_NAMES = {k: v["sheet_name"] for k, v in COMPANIES.items()}
+    
     # Admin user IDs (add your admin Telegram IDs here)
     ADMIN_USERS = {
         1201911108: "Vishesh Sanghvi",  # Main admin
@@ -54,131 +116,294 @@ class CompanyManager:
         # 987654321: "Another Admin"
     }
     
+    # Snapshots at least this large are mmapped on load instead of read into a buffer
+    MMAP_THRESHOLD_BYTES = 1024 * 1024
+    
+    # Journal entries to accumulate before compacting them into a full snapshot
+    SNAPSHOT_EVERY = 200
+    
     def __init__(self):
         self.data_file = os.path.join("data", "user_company_mapping.json")
-        self.user_mappings = self._load_user_mappings()
+        # Append-only log of per-user changes since the last snapshot of data_file
+        self.journal_file = os.path.join("data", "user_company_mapping.log")
+        self._journal_fh = None
+        self._mutation_count = 0
+        # Nesting depth of bulk_update() blocks; changes inside them are saved once on exit
+        self._in_bulk = 0
+        self._bulk_dirty = False
+        # Guards user_mappings read-modify-write and the save (re-entrant: mutators save)
+        self._lock = threading.RLock()
+        # user_mappings ({int user_id: record}) is loaded lazily on first access (see __getattr__)
+        # Short numeric ids for compact callback data
+        self._key_by_id = list(self.COMPANIES)
+        self._id_by_key = {k: i for i, k in enumerate(self._key_by_id)}
+        atexit.register(self._snapshot_if_pending)
         logger.info("🏢 Company Manager initialized")
     
+    def __getattr__(self, name):
+        """📂 Load the mappings from disk the first time they are touched"""
+        if name in ("user_mappings", "_admin_ids", "_by_company"):
+            self.warm()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+    
+    def warm(self):
+        """🔥 Load user mappings now (bot startup) instead of on first use"""
+        with self._lock:
+            if "user_mappings" not in self.__dict__:
+                mappings = self._load_user_mappings()
+                self._rebuild_admin_index(mappings)
+                self._rebuild_company_index(mappings)
+                self.user_mappings = mappings
+    
+    def _rebuild_admin_index(self, mappings: Dict):
+        """👑 Recompute the set of admin ids (ADMIN_USERS plus role == "admin" records)"""
+        self._admin_ids: Set[int] = set(self.ADMIN_USERS) | {
+            user_id for user_id, user_data in mappings.items() if user_data.get("role") == "admin"
+        }
+    
+    def _rebuild_company_index(self, mappings: Dict):
+        """🏢 Recompute the inverted index {company: set of user ids allowed on it}"""
+        self._by_company: Dict[str, Set[int]] = {company: set() for company in self.COMPANIES}
+        for user_id, user_data in mappings.items():
+            for company in user_data.get("allowed_companies", ()):
+                self._by_company.setdefault(company, set()).add(user_id)
+    
     def _load_user_mappings(self) -> Dict:
         """📂 Load user-company mappings from file"""
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    mappings = json.load(f)
-                logger.info(f"📂 Loaded {len(mappings)} user mappings")
+        with self._lock:
+            try:
+                loads = orjson.loads if orjson else json.loads
+                mappings = {}
+                if os.path.exists(self.data_file):
+                    with open(self.data_file, 'rb') as f:
+                        raw = self._read_snapshot(f)
+                    # JSON object keys are strings; keep user ids as ints in memory
+                    mappings = {int(k): v for k, v in raw.items()}
+                
+                # Replay changes journaled since that snapshot
+                replayed = 0
+                if os.path.exists(self.journal_file):
+                    with open(self.journal_file, 'rb') as f:
+                        for line in f:
+                            try:
+                                event = loads(line)
+                            except ValueError:
+                                logger.warning("⚠️ Skipping truncated user mapping journal entry")
+                                continue
+                            if event.get("op") == "del":
+                                mappings.pop(int(event["user"]), None)
+                            else:
+                                mappings[int(event["user"])] = event["data"]
+                            replayed += 1
+                self._mutation_count = replayed
+                
+                if not mappings and not replayed:
+                    logger.info("📂 No existing user mappings found, starting fresh")
+                    return {}
+                
+                for user_id, user_data in mappings.items():
+                    # Intern field names (journal lines are parsed one by one, so they aren't
+                    # shared otherwise), the role and company keys: one string each across records
+                    user_data = mappings[user_id] = {sys.intern(k): v for k, v in user_data.items()}
+                    if isinstance(user_data.get("role"), str):
+                        user_data["role"] = sys.intern(user_data["role"])
+                    if user_data.get("current_company"):
+                        user_data["current_company"] = sys.intern(user_data["current_company"])
+                    # allowed_companies is a set in memory, a sorted list on disk
+                    user_data["allowed_companies"] = {sys.intern(c) for c in user_data.get("allowed_companies", ())}
+                    _migrate_timestamps(user_data)
+                logger.info(f"📂 Loaded {len(mappings)} user mappings ({replayed} journal entries replayed)")
                 return mappings
-            else:
-                logger.info("📂 No existing user mappings found, starting fresh")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"❌ Failed to load user mappings: {e}")
                 return {}
-        except Exception as e:
-            logger.error(f"❌ Failed to load user mappings: {e}")
-            return {}
+    
+    def _read_snapshot(self, f) -> Dict:
+        """📂 Parse the snapshot; large files are mmapped so orjson parses them without a copy"""
+        if orjson and os.fstat(f.fileno()).st_size >= self.MMAP_THRESHOLD_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        raw = f.read()
+        return orjson.loads(raw) if orjson else json.loads(raw)
     
     def _save_user_mappings(self):
-        """💾 Save user-company mappings to file"""
-        try:
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            with open(self.data_file, 'w') as f:
-                json.dump(self.user_mappings, f, indent=2)
-            logger.info("💾 User mappings saved successfully")
-        except Exception as e:
-            logger.error(f"❌ Failed to save user mappings: {e}")
+        """💾 Snapshot all user-company mappings to file (atomic replace) and reset the journal"""
+        with self._lock:
+            tmp_name = None
+            try:
+                payload = _dumps(self.user_mappings, pretty=PRETTY_JSON) + b"\n"
+                data_dir = os.path.dirname(self.data_file)
+                os.makedirs(data_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile('wb', dir=data_dir, suffix='.tmp', delete=False) as f:
+                    tmp_name = f.name
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # The previous snapshot stays intact until this rename succeeds
+                os.replace(tmp_name, self.data_file)
+                tmp_name = None
+                _fsync_dir(data_dir)
+                
+                # Everything journaled so far is now in the snapshot
+                if self._journal_fh is not None:
+                    self._journal_fh.close()
+                    self._journal_fh = None
+                open(self.journal_file, 'wb').close()
+                self._mutation_count = 0
+                logger.info("💾 User mappings saved successfully")
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"❌ Failed to save user mappings: {e}")
+                if tmp_name and os.path.exists(tmp_name):
+                    os.remove(tmp_name)
+    
+    def _journal(self, user_id: int, sync: bool = False):
+        """📝 Append one user's current mapping (or its removal) to the journal"""
+        with self._lock:
+            if self._in_bulk:
+                self._bulk_dirty = True
+                return
+            try:
+                user_data = self.user_mappings.get(user_id)
+                if user_data is None:
+                    event = {"op": "del", "user": user_id}
+                else:
+                    event = {"op": "set", "user": user_id, "data": user_data}
+                
+                if self._journal_fh is None:
+                    os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+                    self._journal_fh = open(self.journal_file, 'ab')
+                self._journal_fh.write(_dumps(event) + b"\n")
+                self._journal_fh.flush()
+                if sync:
+                    os.fsync(self._journal_fh.fileno())
+                
+                self._mutation_count += 1
+                if self._mutation_count >= self.SNAPSHOT_EVERY:
+                    self._save_user_mappings()
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"❌ Failed to journal mapping change for user {user_id}: {e}")
+    
+    @contextlib.contextmanager
+    def bulk_update(self):
+        """
+        📦 Batch many changes into a single save, e.g. for admin migration scripts:
+        
+            with company_manager.bulk_update():
+                for user_id in user_ids:
+                    company_manager.admin_assign_user_to_company(admin_id, user_id, "yugrow")
+        
+        The lock is held for the whole block; one snapshot is written on exit.
+        """
+        with self._lock:
+            self._in_bulk += 1
+            try:
+                yield self
+            finally:
+                self._in_bulk -= 1
+                if self._in_bulk == 0 and self._bulk_dirty:
+                    self._bulk_dirty = False
+                    self._save_user_mappings()
+    
+    def _snapshot_if_pending(self):
+        """💾 Compact the journal into a snapshot if it has entries (shutdown)"""
+        with self._lock:
+            if self._mutation_count:
+                self._save_user_mappings()
+    
+    def _touch(self, user_id: int, data: Dict):
+        """📝 Store a user's mapping record (and keep the admin and company indexes in sync)"""
+        old = self.user_mappings.get(user_id)
+        if old is not None:
+            self._unindex_companies(user_id, old)
+        self.user_mappings[user_id] = data
+        for company in data.get("allowed_companies", ()):
+            self._by_company.setdefault(company, set()).add(user_id)
+        if data.get("role") == "admin":
+            self._admin_ids.add(user_id)
+        elif user_id not in self.ADMIN_USERS:
+            self._admin_ids.discard(user_id)
+    
+    def _drop(self, user_id: int):
+        """🗑️ Remove a user's mapping record (and its admin and company index entries)"""
+        old = self.user_mappings.pop(user_id, None)
+        if old is not None:
+            self._unindex_companies(user_id, old)
+        if user_id not in self.ADMIN_USERS:
+            self._admin_ids.discard(user_id)
+    
+    def _unindex_companies(self, user_id: int, user_data: Dict):
+        """🏢 Drop a user from the company index for every company in their record"""
+        for company in user_data.get("allowed_companies", ()):
+            members = self._by_company.get(company)
+            if members is not None:
+                members.discard(user_id)
     
     # ═══════════════════════════════════════════════════════════════
     # 👤 USER MANAGEMENT METHODS
     # ═══════════════════════════════════════════════════════════════
     
+    @property
+    def total_users(self) -> int:
+        """👥 Number of registered users"""
+        return len(self.user_mappings)
+    
     def get_user_company(self, user_id: int) -> Optional[str]:
         """🏢 Get user's current company"""
-        user_str = str(user_id)
-        if user_str in self.user_mappings:
-            return self.user_mappings[user_str].get("current_company")
-        return None
+        user_data = self.user_mappings.get(user_id)
+        return user_data.get("current_company") if user_data else None
     
     def get_user_allowed_companies(self, user_id: int) -> List[str]:
-        """📋 Get companies user is allowed to access"""
-        user_str = str(user_id)
-        if user_str in self.user_mappings:
-            return self.user_mappings[user_str].get("allowed_companies", [])
-        return []
+        """📋 Get companies user is allowed to access (sorted list)"""
+        user_data = self.user_mappings.get(user_id)
+        return sorted(user_data.get("allowed_companies", ())) if user_data else []
     
     def is_user_registered(self, user_id: int) -> bool:
         """✅ Check if user is registered with any company"""
-        return str(user_id) in self.user_mappings
+        return user_id in self.user_mappings
     
     def is_admin(self, user_id: int) -> bool:
-        """👑 Check if user is admin"""
-        # Check if user is in ADMIN_USERS list
-        if user_id in self.ADMIN_USERS:
-            return True
-        
-        # Check if user has admin role in mappings
-        user_data = self.user_mappings.get(str(user_id), {})
-        if user_data and user_data.get("role") == "admin":
-            return True
-            
-        return False
+        """👑 Check if user is admin (ADMIN_USERS or an admin-role mapping)"""
+        return user_id in self._admin_ids
     
     def register_user(self, user_id: int, user_name: str, initial_company: str, role: str = "user") -> bool:
         """📝 Register new user with initial company"""
-        try:
-            if initial_company not in self.COMPANIES:
+        with self._lock:
+            if initial_company not in self.COMPANY_KEYS:
                 logger.error(f"❌ Invalid company: {initial_company}")
                 return False
+            initial_company = sys.intern(initial_company)
             
-            user_str = str(user_id)
-            self.user_mappings[user_str] = {
+            now_ts = int(time.time())
+            self._touch(user_id, {
                 "user_name": user_name,
                 "current_company": initial_company,
-                "allowed_companies": [initial_company],
+                "allowed_companies": {initial_company},
                 "role": role,
-                "created_date": datetime.now().isoformat(),
-                "last_switched": datetime.now().isoformat()
-            }
+                "created_ts": now_ts,
+                "last_switched_ts": now_ts
+            })
             
-            self._save_user_mappings()
+            self._journal(user_id)
             logger.info(f"📝 Registered user {user_id} ({user_name}) with company {initial_company}")
             return True
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to register user {user_id}: {e}")
-            return False
     
     def switch_user_company(self, user_id: int, new_company: str) -> bool:
         """🔄 Switch user's current company with enhanced validation"""
-        try:
-            # Input validation
-            if not user_id or not isinstance(user_id, int):
-                logger.error(f"❌ Invalid user_id: {user_id}")
-                return False
-            
-            if not new_company or not isinstance(new_company, str):
-                logger.error(f"❌ Invalid company: {new_company}")
-                return False
-            
-            user_str = str(user_id)
-            
-            # Check if user is registered
-            if user_str not in self.user_mappings:
-                logger.error(f"❌ User {user_id} not registered")
-                return False
-            
-            # Check if company exists and is active
-            if new_company not in self.COMPANIES:
-                logger.error(f"❌ Invalid company: {new_company}")
-                return False
-            
-            company_info = self.COMPANIES[new_company]
-            if not company_info.get("active", True):
-                logger.error(f"❌ Company {new_company} is not active")
-                return False
-            
-            # Check user permissions
-            user_data = self.user_mappings[user_str]
-            allowed_companies = user_data.get("allowed_companies", [])
-            if new_company not in allowed_companies:
-                logger.error(f"❌ User {user_id} not allowed access to {new_company}")
+        with self._lock:
+            # Single guard: registered user, active company, and permission
+            user_data = self.user_mappings.get(user_id) if isinstance(user_id, int) else None
+            company_info = self._active_company_info(new_company)
+            if (user_data is None or company_info is None
+                    or new_company not in user_data.get("allowed_companies", ())):
+                if user_data is None:
+                    logger.error(f"❌ User {user_id} not registered")
+                elif company_info is None:
+                    logger.error(f"❌ Invalid or inactive company: {new_company}")
+                else:
+                    logger.error(f"❌ User {user_id} not allowed access to {new_company}")
                 return False
+            new_company = sys.intern(new_company)
             
             # Check if already on this company
             current_company = user_data.get("current_company")
@@ -187,24 +412,12 @@ class CompanyManager:
                 return True  # Not an error, just already there
             
             # Perform the switch
-            self.user_mappings[user_str]["current_company"] = new_company
-            self.user_mappings[user_str]["last_switched"] = datetime.now().isoformat()
-            
-            # Save with error handling
-            try:
-                self._save_user_mappings()
-            except Exception as save_error:
-                logger.error(f"❌ Failed to save user mappings after switch: {save_error}")
-                # Rollback the change
-                self.user_mappings[user_str]["current_company"] = current_company
-                return False
+            user_data["current_company"] = new_company
+            user_data["last_switched_ts"] = int(time.time())
             
+            self._journal(user_id)
             logger.info(f"🔄 User {user_id} switched from {current_company} to {new_company}")
             return True
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to switch user {user_id} to {new_company}: {e}")
-            return False
     
     # ═══════════════════════════════════════════════════════════════
     # 👑 ADMIN MANAGEMENT METHODS
@@ -212,276 +425,266 @@ class CompanyManager:
     
     def admin_assign_user_to_company(self, admin_id: int, user_id: int, company: str) -> bool:
         """👑 Admin: Assign user to a company with enhanced validation"""
-        # Admin permission check
-        if not self.is_admin(admin_id):
-            logger.error(f"❌ User {admin_id} is not admin")
-            return False
-        
-        try:
-            # Input validation
-            if not user_id or not isinstance(user_id, int):
-                logger.error(f"❌ Invalid user_id: {user_id}")
+        with self._lock:
+            # Admin permission check
+            if not self.is_admin(admin_id):
+                logger.error(f"❌ User {admin_id} is not admin")
                 return False
             
-            if not company or not isinstance(company, str):
-                logger.error(f"❌ Invalid company: {company}")
+            # Single guard: valid user id and an existing, active company
+            if not user_id or not isinstance(user_id, int) or self._active_company_info(company) is None:
+                logger.error(f"❌ Invalid assignment: user {user_id} -> company {company}")
                 return False
+            company = sys.intern(company)
             
-            user_str = str(user_id)
-            
-            # Check if company exists and is active
-            if company not in self.COMPANIES:
-                logger.error(f"❌ Invalid company: {company}")
-                return False
-            
-            company_info = self.COMPANIES[company]
-            if not company_info.get("active", True):
-                logger.error(f"❌ Company {company} is not active")
-                return False
+            now_ts = int(time.time())
             
             # Create user if doesn't exist (for admin assignment)
-            if user_str not in self.user_mappings:
+            user_data = self.user_mappings.get(user_id)
+            if user_data is None:
                 logger.info(f"📝 Creating new user {user_id} during admin assignment")
-                self.user_mappings[user_str] = {
+                self._touch(user_id, {
                     "user_name": f"User_{user_id}",  # Will be updated when user first interacts
                     "current_company": company,
-                    "allowed_companies": [company],
+                    "allowed_companies": {company},
                     "role": "user",
-                    "created_date": datetime.now().isoformat(),
-                    "last_switched": datetime.now().isoformat(),
+                    "created_ts": now_ts,
+                    "last_switched_ts": now_ts,
                     "created_by_admin": admin_id
-                }
+                })
             else:
                 # Update existing user
-                user_data = self.user_mappings[user_str]
+                allowed = user_data.setdefault("allowed_companies", set())
+                
+                # Already assigned and active on this company - nothing to save
+                if user_data.get("current_company") == company and company in allowed:
+                    logger.debug(f"ℹ️ User {user_id} already assigned to {company}, skipping save")
+                    return True
                 
                 # Add company to allowed companies if not already there
-                allowed = user_data.get("allowed_companies", [])
                 if company not in allowed:
-                    allowed.append(company)
-                    user_data["allowed_companies"] = allowed
+                    allowed.add(company)
+                    self._by_company.setdefault(company, set()).add(user_id)
                     logger.info(f"📝 Added {company} to allowed companies for user {user_id}")
                 
                 # Switch user to this company
                 old_company = user_data.get("current_company")
                 user_data["current_company"] = company
-                user_data["last_switched"] = datetime.now().isoformat()
+                user_data["last_switched_ts"] = now_ts
                 user_data["last_assigned_by"] = admin_id
                 
                 logger.info(f"🔄 User {user_id} switched from {old_company} to {company} by admin {admin_id}")
             
-            # Save with error handling
-            try:
-                self._save_user_mappings()
-            except Exception as save_error:
-                logger.error(f"❌ Failed to save user mappings after assignment: {save_error}")
-                return False
-            
+            self._journal(user_id)
             logger.info(f"👑 Admin {admin_id} successfully assigned user {user_id} to company {company}")
             return True
-            
-        except Exception as e:
-            logger.error(f"❌ Admin assign failed: {e}")
-            return False
     
-    def admin_remove_user_from_company(self, admin_id: int, user_id: int, company: str) -> bool:
-        """👑 Admin: Remove user from a company"""
-        if not self.is_admin(admin_id):
-            logger.error(f"❌ User {admin_id} is not admin")
-            return False
-        
-        try:
-            user_str = str(user_id)
+    def admin_remove_user_from_company(self, admin_id: int, user_id: int, company: str, sync: bool = False) -> bool:
+        """👑 Admin: Remove user from a company (sync=True fsyncs the change to disk)"""
+        with self._lock:
+            if not self.is_admin(admin_id):
+                logger.error(f"❌ User {admin_id} is not admin")
+                return False
             
-            if user_str not in self.user_mappings:
+            user_data = self.user_mappings.get(user_id)
+            if user_data is None:
                 logger.error(f"❌ User {user_id} not found")
                 return False
             
-            allowed = self.user_mappings[user_str].get("allowed_companies", [])
+            allowed = user_data.get("allowed_companies", set())
             if company in allowed:
-                allowed.remove(company)
-                self.user_mappings[user_str]["allowed_companies"] = allowed
+                # Refuse before mutating if this would leave the user with no companies
+                if len(allowed) == 1:
+                    logger.warning(f"⚠️ User {user_id} has no companies left!")
+                    return False
+                allowed.discard(company)
+                self._by_company.get(company, set()).discard(user_id)
                 
                 # If current company was removed, switch to first available
-                if self.user_mappings[user_str]["current_company"] == company:
-                    if allowed:
-                        self.user_mappings[user_str]["current_company"] = allowed[0]
-                    else:
-                        # User has no companies left
-                        logger.warning(f"⚠️ User {user_id} has no companies left!")
-                        return False
+                if user_data.get("current_company") == company:
+                    user_data["current_company"] = min(allowed)
                 
-                self._save_user_mappings()
+                self._journal(user_id, sync=sync)
                 logger.info(f"👑 Admin {admin_id} removed user {user_id} from company {company}")
                 return True
             else:
                 logger.error(f"❌ User {user_id} not in company {company}")
                 return False
-                
-        except Exception as e:
-            logger.error(f"❌ Admin remove failed: {e}")
-            return False
     
-    def admin_get_all_users(self, admin_id: int) -> Dict:
-        """👑 Admin: Get all user mappings"""
+    def admin_bulk_assign(self, admin_id: int, assignments: List[Tuple[int, str]]) -> List[bool]:
+        """👑 Admin: Assign many (user_id, company) pairs with a single save; returns per-item results"""
+        if not self.is_admin(admin_id):
+            logger.error(f"❌ User {admin_id} is not admin")
+            return [False] * len(assignments)
+        
+        with self.bulk_update():
+            results = [self.admin_assign_user_to_company(admin_id, user_id, company)
+                       for user_id, company in assignments]
+        logger.info(f"👑 Admin {admin_id} bulk-assigned {sum(results)}/{len(results)} users")
+        return results
+    
+    def admin_bulk_remove(self, admin_id: int, removals: List[Tuple[int, str]]) -> List[bool]:
+        """👑 Admin: Remove many (user_id, company) pairs with a single save; returns per-item results"""
+        if not self.is_admin(admin_id):
+            logger.error(f"❌ User {admin_id} is not admin")
+            return [False] * len(removals)
+        
+        with self.bulk_update():
+            results = [self.admin_remove_user_from_company(admin_id, user_id, company)
+                       for user_id, company in removals]
+        logger.info(f"👑 Admin {admin_id} bulk-removed {sum(results)}/{len(results)} users")
+        return results
+    
+    def admin_get_all_users(self, admin_id: int) -> Mapping:
+        """
+        👑 Admin: Get all user mappings as a live read-only view (no copy).
+        The view reflects later changes; use snapshot() for an isolated copy.
+        """
         if not self.is_admin(admin_id):
             logger.error(f"❌ User {admin_id} is not admin")
             return {}
         
-        return self.user_mappings.copy()
+        return MappingProxyType(self.user_mappings)
+    
+    def list_users_by_company(self, company: str) -> FrozenSet[int]:
+        """🏢 Ids of users allowed on a company, from the inverted index (no scan over all users)"""
+        with self._lock:
+            return frozenset(self._by_company.get(company, ()))
+    
+    def snapshot(self) -> Dict:
+        """📸 Deep copy of all user mappings, taken under the lock"""
+        with self._lock:
+            return copy.deepcopy(self.user_mappings)
     
     # ═══════════════════════════════════════════════════════════════
     # 🏢 COMPANY UTILITY METHODS
     # ═══════════════════════════════════════════════════════════════
     
+    def _active_company_info(self, company_key) -> Optional[Dict]:
+        """🏢 Company config if the key names an existing, active company, else None"""
+        if not isinstance(company_key, str):
+            return None
+        company_info = self.COMPANIES.get(company_key)
+        return company_info if company_info and company_info.get("active", True) else None
+    
     def get_company_info(self, company_key: str) -> Dict:
         """🏢 Get company information"""
         return self.COMPANIES.get(company_key, {})
     
     def get_all_companies(self) -> Dict:
-        """🏢 Get all active companies"""
-        return {k: v for k, v in self.COMPANIES.items() if v.get("active", True)}
+        """🏢 Get all active companies (shared read-only mapping)"""
+        return self._ACTIVE_COMPANIES
+    
+    def get_company_id(self, company_key: str) -> int:
+        """🔢 Get the short numeric id used in callback data"""
+        return self._id_by_key[company_key]
+    
+    def get_company_key_by_id(self, company_id: int) -> Optional[str]:
+        """🔢 Resolve a numeric company id back to its key"""
+        if 0 <= company_id < len(self._key_by_id):
+            return self._key_by_id[company_id]
+        return None
     
     def get_company_display_name(self, company_key: str) -> str:
         """🏢 Get company display name"""
-        return self.COMPANIES.get(company_key, {}).get("display_name", company_key)
+        return self._DISPLAY_NAMES.get(company_key, company_key)
     
     def get_company_sheet_name(self, company_key: str) -> str:
         """📊 Get company's Google Sheet name"""
-        return self.COMPANIES.get(company_key, {}).get("sheet_name", f"{company_key}_Data")
+        return self._SHEET_NAMES.get(company_key) or f"{company_key}_Data"
     
     def assign_user_to_company(self, user_id: int, company_key: str) -> bool:
         """
         🔄 Simplified user assignment method with fallback behavior.
         Used by company registration and admin commands.
         """
-        try:
-            # Input validation
-            if not user_id or not isinstance(user_id, int):
-                logger.error(f"❌ Invalid user_id: {user_id}")
-                return False
-            
-            if not company_key or company_key not in self.COMPANIES:
-                logger.error(f"❌ Invalid company: {company_key}")
+        with self._lock:
+            # Single guard: valid user id and a known company
+            if not user_id or not isinstance(user_id, int) or not isinstance(company_key, str) \
+                    or company_key not in self.COMPANY_KEYS:
+                logger.error(f"❌ Invalid assignment: user {user_id} -> company {company_key}")
                 return False
-            
-            user_str = str(user_id)
+            company_key = sys.intern(company_key)
             
             # Create or update user mapping
-            if user_str not in self.user_mappings:
+            if user_id not in self.user_mappings:
                 # New user registration
-                self.user_mappings[user_str] = {
+                now_ts = int(time.time())
+                self._touch(user_id, {
                     "user_name": f"User_{user_id}",
                     "current_company": company_key,
-                    "allowed_companies": [company_key],
+                    "allowed_companies": {company_key},
                     "role": "user",
-                    "created_date": datetime.now().isoformat(),
-                    "last_switched": datetime.now().isoformat()
-                }
+                    "created_ts": now_ts,
+                    "last_switched_ts": now_ts
+                })
                 logger.info(f"📝 New user {user_id} registered with company {company_key}")
             else:
                 # Existing user - switch company
                 return self.switch_user_company(user_id, company_key)
             
-            # Save with error handling
-            try:
-                self._save_user_mappings()
-                return True
-            except Exception as save_error:
-                logger.error(f"❌ Failed to save user assignment: {save_error}")
-                # Remove the user mapping if save failed
-                if user_str in self.user_mappings:
-                    del self.user_mappings[user_str]
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ User assignment failed: {e}")
-            return False
+            self._journal(user_id)
+            return True
     
-    def remove_user_from_company(self, user_id: int) -> bool:
+    def remove_user_from_company(self, user_id: int, sync: bool = False) -> bool:
         """
         🗑️ Remove user from current company (admin function).
+        Pass sync=True to fsync the removal to disk before returning.
         """
-        try:
-            user_str = str(user_id)
-            
-            if user_str not in self.user_mappings:
+        with self._lock:
+            user_data = self.user_mappings.get(user_id)
+            if user_data is None:
                 logger.error(f"❌ User {user_id} not found")
                 return False
             
             # Get current company before removal
-            current_company = self.user_mappings[user_str].get("current_company")
+            current_company = user_data.get("current_company")
             
             # Remove user completely
-            del self.user_mappings[user_str]
+            self._drop(user_id)
             
-            # Save changes
-            try:
-                self._save_user_mappings()
-                logger.info(f"🗑️ User {user_id} removed from company {current_company}")
-                return True
-            except Exception as save_error:
-                logger.error(f"❌ Failed to save user removal: {save_error}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ User removal failed: {e}")
-            return False
+            self._journal(user_id, sync=sync)
+            logger.info(f"🗑️ User {user_id} removed from company {current_company}")
+            return True
     
     def validate_user_access(self, user_id: int, company_key: str) -> bool:
         """
         🔍 Validate if user has access to specific company.
         """
-        try:
-            user_str = str(user_id)
-            
-            if user_str not in self.user_mappings:
-                return False
-            
-            if company_key not in self.COMPANIES:
-                return False
-            
-            allowed_companies = self.user_mappings[user_str].get("allowed_companies", [])
-            return company_key in allowed_companies
-            
-        except Exception as e:
-            logger.error(f"❌ Access validation failed: {e}")
+        user_data = self.user_mappings.get(user_id)
+        if user_data is None or company_key not in self.COMPANY_KEYS:
             return False
+        
+        return company_key in user_data.get("allowed_companies", ())
     
     def get_user_info(self, user_id: int) -> Dict:
         """
         📋 Get complete user information with fallback values.
         """
-        try:
-            user_str = str(user_id)
-            
-            if user_str not in self.user_mappings:
-                return {
-                    "registered": False,
-                    "current_company": None,
-                    "allowed_companies": [],
-                    "role": "user"
-                }
-            
-            user_data = self.user_mappings[user_str].copy()
-            user_data["registered"] = True
-            
-            # Add company display names
-            current_company = user_data.get("current_company")
-            if current_company:
-                user_data["current_company_display"] = self.get_company_display_name(current_company)
-            
-            return user_data
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to get user info for {user_id}: {e}")
+        user_data = self.user_mappings.get(user_id)
+        if user_data is None:
             return {
                 "registered": False,
                 "current_company": None,
                 "allowed_companies": [],
-                "role": "user",
-                "error": str(e)
+                "role": "user"
             }
+        
+        with self._lock:
+            user_data = user_data.copy()
+            user_data["allowed_companies"] = sorted(user_data.get("allowed_companies", ()))
+        user_data["registered"] = True
+        
+        # Timestamps are stored as epoch seconds; format only for display
+        if user_data.get("last_switched_ts"):
+            user_data["last_switched_iso"] = datetime.fromtimestamp(user_data["last_switched_ts"]).isoformat()
+        
+        # Add company display names
+        current_company = user_data.get("current_company")
+        if current_company:
+            user_data["current_company_display"] = self.get_company_display_name(current_company)
+        
+        return user_data
 
 
 # Global company manager instance
@@ -7,8 +7,8 @@ load_dotenv()
 # Bot token from environment variables
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
-# Admin IDs as a list of integers
-ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS', '1201911108').split(',')]
+# Admin IDs parsed once at import; a frozenset makes `user_id in ADMIN_IDS` O(1)
+ADMIN_IDS = frozenset(int(x) for x in os.getenv('ADMIN_IDS', '1201911108').split(',') if x.strip())
 
 # 🔑 Multi-API Key Configuration for Parallel Processing
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
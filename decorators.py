@@ -5,9 +5,14 @@ Decorators for error handling, retries, and performance monitoring
 import functools
 import asyncio
 import time
+from collections import OrderedDict
 from typing import Callable, Any, Optional
 from logger import logger
 
+# User-facing notices sent by the handler decorators
+RATE_LIMIT_MESSAGE = "⏰ You're sending messages too quickly. Please wait a moment and try again."
+ERROR_MESSAGE = "⚠️ Something went wrong. Please try again or contact support if the issue persists."
+
 
 def retry(max_attempts: int = 3, delay: float = 1.0, backoff: float = 2.0, exceptions: tuple = (Exception,)):
     """
@@ -20,55 +25,41 @@ def retry(max_attempts: int = 3, delay: float = 1.0, backoff: float = 2.0, excep
         exceptions: Tuple of exceptions to catch and retry
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def async_wrapper(*args, **kwargs) -> Any:
-            current_delay = delay
-            last_exception = None
-            
-            for attempt in range(max_attempts):
-                try:
-                    if asyncio.iscoroutinefunction(func):
+        # Wrapper kind is chosen once here, never per call/attempt
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                current_delay = delay
+                for attempt in range(max_attempts):
+                    try:
                         return await func(*args, **kwargs)
-                    else:
-                        return func(*args, **kwargs)
-                except exceptions as e:
-                    last_exception = e
-                    logger.warning(f"Attempt {attempt + 1}/{max_attempts} failed for {func.__name__}: {str(e)}")
-                    
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(current_delay)
-                        current_delay *= backoff
-                    else:
-                        logger.error(f"All {max_attempts} attempts failed for {func.__name__}")
-                        raise last_exception
+                    except exceptions as e:
+                        logger.warning(f"Attempt {attempt + 1}/{max_attempts} failed for {func.__name__}: {str(e)}")
+                        if attempt == max_attempts - 1:
+                            logger.error(f"All {max_attempts} attempts failed for {func.__name__}")
+                            raise
+                    await asyncio.sleep(current_delay)
+                    current_delay *= backoff
+                return None
             
-            return None
+            return async_wrapper
         
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs) -> Any:
             current_delay = delay
-            last_exception = None
-            
             for attempt in range(max_attempts):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
-                    last_exception = e
                     logger.warning(f"Attempt {attempt + 1}/{max_attempts} failed for {func.__name__}: {str(e)}")
-                    
-                    if attempt < max_attempts - 1:
-                        time.sleep(current_delay)
-                        current_delay *= backoff
-                    else:
+                    if attempt == max_attempts - 1:
                         logger.error(f"All {max_attempts} attempts failed for {func.__name__}")
-                        raise last_exception
-            
+                        raise
+                time.sleep(current_delay)
+                current_delay *= backoff
             return None
         
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return sync_wrapper
     
     return decorator
 
@@ -82,30 +73,21 @@ def handle_errors(default_return: Any = None, notify_user: bool = True):
         notify_user: Whether to send error message to user
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def async_wrapper(*args, **kwargs) -> Any:
-            try:
-                return await func(*args, **kwargs)
-            except Exception as e:
-                logger.error(f"Error in {func.__name__}: {str(e)}", exc_info=True)
-                
-                if notify_user and len(args) > 0:
-                    # Try to find update object in args to send error message
-                    update = None
-                    for arg in args:
-                        if hasattr(arg, 'message') and hasattr(arg.message, 'reply_text'):
-                            update = arg
-                            break
+        # Only the wrapper matching func is built
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    logger.error(f"Error in {func.__name__}: {str(e)}", exc_info=True)
                     
-                    if update:
-                        try:
-                            await update.message.reply_text(
-                                "⚠️ Something went wrong. Please try again or contact support if the issue persists."
-                            )
-                        except:
-                            pass  # Don't fail if we can't send error message
-                
-                return default_return
+                    if notify_user:
+                        await _safe_reply(_update_from_args(args), ERROR_MESSAGE)
+                    
+                    return default_return
+            
+            return async_wrapper
         
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs) -> Any:
@@ -115,10 +97,7 @@ def handle_errors(default_return: Any = None, notify_user: bool = True):
                 logger.error(f"Error in {func.__name__}: {str(e)}", exc_info=True)
                 return default_return
         
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return sync_wrapper
     
     return decorator
 
@@ -128,22 +107,26 @@ def measure_time(log_level: str = "INFO"):
     Decorator to measure and log function execution time
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def async_wrapper(*args, **kwargs) -> Any:
-            start_time = time.time()
-            try:
-                result = await func(*args, **kwargs)
-                execution_time = time.time() - start_time
-                getattr(logger, log_level.lower())(
-                    f"{func.__name__} executed in {execution_time:.3f} seconds"
-                )
-                return result
-            except Exception as e:
-                execution_time = time.time() - start_time
-                logger.error(
-                    f"{func.__name__} failed after {execution_time:.3f} seconds: {str(e)}"
-                )
-                raise
+        # Log method and wrapper kind are resolved once here, not per call
+        log = getattr(logger, log_level.lower())
+        
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                start_time = time.time()
+                try:
+                    result = await func(*args, **kwargs)
+                    execution_time = time.time() - start_time
+                    log(f"{func.__name__} executed in {execution_time:.3f} seconds")
+                    return result
+                except Exception as e:
+                    execution_time = time.time() - start_time
+                    logger.error(
+                        f"{func.__name__} failed after {execution_time:.3f} seconds: {str(e)}"
+                    )
+                    raise
+            
+            return async_wrapper
         
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs) -> Any:
@@ -151,9 +134,7 @@ def measure_time(log_level: str = "INFO"):
             try:
                 result = func(*args, **kwargs)
                 execution_time = time.time() - start_time
-                getattr(logger, log_level.lower())(
-                    f"{func.__name__} executed in {execution_time:.3f} seconds"
-                )
+                log(f"{func.__name__} executed in {execution_time:.3f} seconds")
                 return result
             except Exception as e:
                 execution_time = time.time() - start_time
@@ -162,59 +143,115 @@ def measure_time(log_level: str = "INFO"):
                 )
                 raise
         
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return sync_wrapper
     
     return decorator
 
 
+# Hard cap on a rate limiter's table; past it the least recently used bucket is evicted
+MAX_BUCKETS = 4096
+
+
+def _allow_call(buckets: OrderedDict, user_id: int, calls_per_minute: int) -> bool:
+    """
+    Token bucket check: each user holds up to calls_per_minute tokens, refilled
+    continuously at calls_per_minute per minute; a call spends one token
+    
+    buckets is kept in least-recently-used order, so idle entries are evicted from
+    the front without scanning the table.
+    """
+    now = time.monotonic()
+    tokens, last_refill = buckets.get(user_id, (calls_per_minute, now))
+    tokens = min(calls_per_minute, tokens + (now - last_refill) * calls_per_minute / 60)
+    
+    allowed = tokens >= 1
+    buckets[user_id] = (tokens - 1 if allowed else tokens, now)
+    buckets.move_to_end(user_id)
+    
+    # A bucket idle for a full minute has refilled completely, so dropping it is lossless;
+    # past MAX_BUCKETS the oldest goes regardless
+    while buckets:
+        _, (_, last) = next(iter(buckets.items()))
+        if now - last < 60 and len(buckets) <= MAX_BUCKETS:
+            break
+        buckets.popitem(last=False)
+    return allowed
+
+
+def _update_from_args(args: tuple):
+    """
+    Find the Telegram update in a handler's positional args
+    
+    Handlers receive the update first, so args[0] is checked directly; the scan
+    over the remaining args only runs for non-standard signatures.
+    """
+    if args and hasattr(args[0], 'effective_user'):
+        return args[0]
+    return next((arg for arg in args if hasattr(arg, 'effective_user')), None)
+
+
+async def _safe_reply(update, text: str):
+    """Reply to the update's message, ignoring failures (and updates without a message)"""
+    if getattr(update, 'message', None) is None:
+        return
+    try:
+        await update.message.reply_text(text)
+    except Exception:
+        pass  # Don't fail if we can't send the notice
+
+
 def rate_limit(calls_per_minute: int = 10):
     """
     Rate limiting decorator to prevent spam
     """
-    call_times = {}
+    buckets = OrderedDict()  # {user_id: (tokens, last_refill)}, least recently used first
     
     def decorator(func: Callable) -> Callable:
+        if not asyncio.iscoroutinefunction(func):
+            return func  # Rate limiting only works for async functions
+        
         @functools.wraps(func)
         async def async_wrapper(*args, **kwargs) -> Any:
-            # Try to extract user ID from args
-            user_id = None
-            for arg in args:
-                if hasattr(arg, 'effective_user') and hasattr(arg.effective_user, 'id'):
-                    user_id = arg.effective_user.id
-                    break
+            update = _update_from_args(args)
+            user_id = getattr(getattr(update, 'effective_user', None), 'id', None)
             
-            if user_id:
-                current_time = time.time()
-                user_calls = call_times.get(user_id, [])
-                
-                # Remove calls older than 1 minute
-                user_calls = [call_time for call_time in user_calls if current_time - call_time < 60]
-                
-                if len(user_calls) >= calls_per_minute:
-                    logger.warning(f"Rate limit exceeded for user {user_id}")
-                    # Try to send rate limit message
-                    for arg in args:
-                        if hasattr(arg, 'message') and hasattr(arg.message, 'reply_text'):
-                            try:
-                                await arg.message.reply_text(
-                                    "⏰ You're sending messages too quickly. Please wait a moment and try again."
-                                )
-                            except:
-                                pass
-                            break
-                    return None
-                
-                user_calls.append(current_time)
-                call_times[user_id] = user_calls
+            if user_id and not _allow_call(buckets, user_id, calls_per_minute):
+                logger.warning(f"Rate limit exceeded for user {user_id}")
+                await _safe_reply(update, RATE_LIMIT_MESSAGE)
+                return None
             
             return await func(*args, **kwargs)
         
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return func  # Rate limiting only works for async functions
+        return async_wrapper
+    
+    return decorator
+
+def guarded(calls_per_minute: int = 10, notify_user: bool = True):
+    """
+    Rate limiting and error handling for async command handlers in one wrapper
     
-    return decorator
\ No newline at end of file
+    Behaves like @rate_limit(calls_per_minute) stacked on @handle_errors(notify_user)
+    but costs a single extra frame per call.
+    """
+    buckets = OrderedDict()  # {user_id: (tokens, last_refill)}, least recently used first
+    
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def async_wrapper(update, context, *args, **kwargs) -> Any:
+            user = getattr(update, 'effective_user', None)
+            if user and not _allow_call(buckets, user.id, calls_per_minute):
+                logger.warning(f"Rate limit exceeded for user {user.id}")
+                await _safe_reply(update, RATE_LIMIT_MESSAGE)
+                return None
+            
+            try:
+                return await func(update, context, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error in {func.__name__}: {str(e)}", exc_info=True)
+                if notify_user:
+                    await _safe_reply(update, ERROR_MESSAGE)
+                return None
+        
+        return async_wrapper
+    
+    return decorator
@@ -2,111 +2,362 @@
 Centralized error handling system for the Performance Tracker bot
 """
 
+import asyncio
+import logging
+import re
+import time
 import traceback
-from enum import Enum
+from collections import OrderedDict, deque, namedtuple
+from enum import IntEnum
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional, Dict, Any
 from telegram import Update
+from telegram.error import Forbidden, RetryAfter, TimedOut
 from telegram.ext import ContextTypes
 from logger import logger
 
+try:
+    from gspread.exceptions import APIError as GSpreadAPIError
+except ImportError:
+    GSpreadAPIError = None
 
-class ErrorType(Enum):
-    """Types of errors that can occur"""
-    VALIDATION_ERROR = "validation"
-    API_ERROR = "api"
-    DATABASE_ERROR = "database"
-    NETWORK_ERROR = "network"
-    PERMISSION_ERROR = "permission"
-    RATE_LIMIT_ERROR = "rate_limit"
-    LOCATION_ERROR = "location"
-    GEOCODING_ERROR = "geocoding"
-    GPS_ERROR = "gps"
-    UNKNOWN_ERROR = "unknown"
+
+class ErrorType(IntEnum):
+    """
+    Types of errors that can occur
+    
+    Dense int values so per-type tables can be tuples indexed by the member
+    (IntEnum also hashes as a plain int); use .label for the readable name.
+    """
+    VALIDATION_ERROR = 0
+    API_ERROR = 1
+    DATABASE_ERROR = 2
+    NETWORK_ERROR = 3
+    PERMISSION_ERROR = 4
+    RATE_LIMIT_ERROR = 5
+    LOCATION_ERROR = 6
+    GEOCODING_ERROR = 7
+    GPS_ERROR = 8
+    UNKNOWN_ERROR = 9
+    
+    @property
+    def label(self) -> str:
+        """Short name used in logs and error reports (e.g. "rate_limit")"""
+        return _ERROR_TYPE_LABELS[self]
+
+
+_ERROR_TYPE_LABELS = (
+    "validation", "api", "database", "network", "permission",
+    "rate_limit", "location", "geocoding", "gps", "unknown"
+)
+
+
+# Exception classes that identify their error type outright; classify_error walks
+# the MRO, so the most specific registered class wins and no message scan is needed
+_EXC_TYPE_MAP = {
+    TimeoutError: ErrorType.NETWORK_ERROR,
+    ConnectionError: ErrorType.NETWORK_ERROR,
+    TimedOut: ErrorType.NETWORK_ERROR,
+    PermissionError: ErrorType.PERMISSION_ERROR,
+    Forbidden: ErrorType.PERMISSION_ERROR,
+    RetryAfter: ErrorType.RATE_LIMIT_ERROR,
+    ValueError: ErrorType.VALIDATION_ERROR,
+}
+if GSpreadAPIError is not None:
+    _EXC_TYPE_MAP[GSpreadAPIError] = ErrorType.DATABASE_ERROR
+
+# Message keywords per error type, in priority order (which is also ErrorType's
+# int order): when a message matches several types, the earliest one here wins
+_ERROR_KEYWORDS = (
+    (ErrorType.VALIDATION_ERROR, ('validation', 'invalid')),
+    (ErrorType.API_ERROR, ('api', 'gemini')),
+    (ErrorType.DATABASE_ERROR, ('sheet', 'database', 'gspread')),
+    (ErrorType.NETWORK_ERROR, ('network', 'connection', 'timeout')),
+    (ErrorType.PERMISSION_ERROR, ('permission', 'unauthorized', 'forbidden')),
+    (ErrorType.RATE_LIMIT_ERROR, ('rate limit', 'too many')),
+    (ErrorType.LOCATION_ERROR, ('location', 'coordinates')),
+    (ErrorType.GEOCODING_ERROR, ('geocoding', 'address', 'nominatim')),
+    (ErrorType.GPS_ERROR, ('gps', 'latitude', 'longitude')),
+)
+# One named group per error type, so a match's lastgroup is the ErrorType name.
+# Zero-width lookahead so every keyword occurrence is found in one pass, even overlapping ones
+_KEYWORD_PATTERN = re.compile('(?=' + '|'.join(
+    f"(?P<{error_type.name}>{'|'.join(map(re.escape, keywords))})" for error_type, keywords in _ERROR_KEYWORDS
+) + ')')
+
+
+@lru_cache(maxsize=1024)
+def _classify_cached(error_message: str) -> ErrorType:
+    """
+    Keyword classification of a lowercased error message, memoized so repeated
+    errors (retry storms, rate-limit floods) skip the scan. Keyed on the message
+    string only, so no exception (or its traceback) is kept alive by the cache.
+    """
+    # One scan over the message for all keywords; the highest-priority (lowest) type found wins
+    return min(
+        (ErrorType[match.lastgroup] for match in _KEYWORD_PATTERN.finditer(error_message)),
+        default=ErrorType.UNKNOWN_ERROR
+    )
+
+
+# Seconds during which a repeat of the same error type in a chat is not re-announced
+NOTIFY_DEDUP_SECONDS = 5.0
+# Hard cap on remembered notices; past it the oldest stamp is dropped
+MAX_NOTIFY_ENTRIES = 4096
+# {(chat_id, ErrorType or validation notice text): monotonic time of the last notice sent},
+# oldest first, so expired stamps are dropped from the front without a scan
+_LAST_NOTIFY: "OrderedDict[tuple, float]" = OrderedDict()
+
+
+def _should_notify(chat_id: int, notice: Any) -> bool:
+    """True unless this chat got this notice (an ErrorType, or exact text) within NOTIFY_DEDUP_SECONDS"""
+    now = time.monotonic()
+    key = (chat_id, notice)
+    last = _LAST_NOTIFY.get(key)
+    if last is not None and now - last < NOTIFY_DEDUP_SECONDS:
+        return False
+    _LAST_NOTIFY[key] = now
+    _LAST_NOTIFY.move_to_end(key)
+    while _LAST_NOTIFY:
+        oldest = next(iter(_LAST_NOTIFY.values()))
+        if now - oldest < NOTIFY_DEDUP_SECONDS and len(_LAST_NOTIFY) <= MAX_NOTIFY_ENTRIES:
+            break
+        _LAST_NOTIFY.popitem(last=False)
+    return True
+
+
+# Upper bound on how long an error notice may hold up the handler that sent it
+REPLY_TIMEOUT_SECONDS = 5.0
+
+# Log level and message template per known location event type
+_LOCATION_EVENT_LOGS = {
+    'location_shared': (logging.INFO, "📍 Location shared by user %s: %s"),
+    'location_error': (logging.ERROR, "📍 Location error for user %s: %s"),
+    'geocoding_failed': (logging.WARNING, "🌍 Geocoding failed for user %s: %s"),
+    'gps_accuracy_warning': (logging.WARNING, "⚠️ GPS accuracy warning for user %s: %s"),
+}
+
+
+# Same layout as the log formatter's asctime ("2024-01-31 09:15:02,123")
+_TS_FMT = '%Y-%m-%d %H:%M:%S'
+
+
+def _timestamp() -> str:
+    """Current local time formatted like the log lines"""
+    now = time.time()
+    return f"{time.strftime(_TS_FMT, time.localtime(now))},{int(now % 1 * 1000):03d}"
+
+
+# Plain-text fallback: drop bold markers and undo _escape_markdown's escapes (an
+# escaped marker keeps its character; other backslashes are left alone)
+_BOLD_OR_ESCAPE = re.compile(r'\\([_*`\[])|\*')
+# Extra characters to delete from a specific plain variant (the code fences in 'api')
+_STRIP_CODE = str.maketrans('', '', '`')
+# Characters that make legacy Telegram Markdown parsing matter
+_MARKDOWN_CHARS = frozenset('*`_[')
+
+
+# Characters legacy Telegram Markdown treats as entity markers
+_MARKDOWN_SPECIAL = re.compile(r'([_*`\[])')
+
+
+def _escape_markdown(value: Any) -> str:
+    """Backslash-escape Markdown markers in user or error text so it can't break the reply's parsing"""
+    return _MARKDOWN_SPECIAL.sub(r'\\\1', str(value))
+
+
+def _strip_markdown(text: str, table: Optional[dict] = None) -> str:
+    """Plain-text fallback for a Markdown message"""
+    text = _BOLD_OR_ESCAPE.sub(r'\1', text)
+    return text.translate(table) if table else text
+
+
+# Fixed message text, built once at import as (markdown, plain) pairs; handlers
+# only format the dynamic bits (error text, field names, coordinates, accuracy)
+_STATIC_MESSAGES = {
+    'validation_help': (
+        "💡 **How to fix:**\n"
+        "• Use the correct format shown in the examples\n"
+        "• Check for typos in numbers and text\n"
+        "• Make sure all required fields are filled\n\n"
+        "Need help? Use /help for examples and guidance."
+    ),
+    'api': (
+        "🔧 **Service Issue**\n\n"
+        "Our AI parsing service is temporarily unavailable.\n\n"
+        "💡 **What you can do:**\n"
+        "• Try using the structured format:\n"
+        "```\n"
+        "Client: Apollo Pharmacy\n"
+        "Location: Bandra\n"
+        "Orders: 3\n"
+        "Amount: ₹24000\n"
+        "Remarks: Good conversation\n"
+        "```\n"
+        "• Or try again in a few minutes"
+    ),
+    'db_service': (
+        "💾 **Data Service Issue**\n\n"
+        "Unable to save your entry right now, but don't worry!\n\n"
+    ),
+    'db_next_steps': (
+        "💡 **What happens next:**\n"
+        "• Your data is temporarily stored\n"
+        "• Try again in a few minutes\n"
+        "• Contact support if the issue persists"
+    ),
+    'location_troubleshooting': (
+        "💡 **Troubleshooting Steps:**\n"
+        "• Ensure GPS is enabled on your device\n"
+        "• Check that Telegram has location permissions\n"
+        "• Try moving to an area with better GPS signal\n"
+        "• Wait a moment and try sharing location again\n\n"
+        "🔄 **Alternative:** You can continue without GPS - just enter location manually in your sales entries."
+    ),
+    'geocoding_help': (
+        "💡 **What this means:**\n"
+        "• Your location is still saved with GPS coordinates\n"
+        "• Sales entries will include coordinate data\n"
+        "• Analytics will work with coordinate-based insights\n\n"
+        "🔧 **Possible causes:**\n"
+        "• Geocoding service temporarily unavailable\n"
+        "• Location is in a remote area\n"
+        "• Network connectivity issues\n\n"
+        "✅ **Your location data is still valuable for analytics!**"
+    ),
+    'gps_accuracy_tips': (
+        "💡 **To improve accuracy:**\n"
+        "• Move to an open area away from buildings\n"
+        "• Ensure GPS is enabled in device settings\n"
+        "• Wait for GPS to get a better signal\n"
+        "• Try sharing location again in a few moments\n\n"
+        "🤔 **Continue anyway?**\n"
+        "Your location will still be saved, but may be less precise for analytics."
+    ),
+    'location_permission_android_ios': (
+        "🔒 **Location Permission Required**\n\n"
+        "It looks like location sharing was denied or cancelled.\n\n"
+        "📍 **To enable location features:**\n\n"
+        "**On Android:**\n"
+        "1. Open Telegram settings\n"
+        "2. Go to Privacy and Security\n"
+        "3. Enable Location permissions\n"
+        "4. Try `/location` command again\n\n"
+        "**On iOS:**\n"
+        "1. Go to iPhone Settings\n"
+        "2. Find Telegram in app list\n"
+        "3. Enable Location permissions\n"
+        "4. Try `/location` command again\n\n"
+        "💡 **Benefits of location sharing:**\n"
+        "• Automatic location tagging in sales entries\n"
+        "• Territory performance analytics\n"
+        "• Route optimization insights\n"
+        "• Geographic sales distribution analysis\n\n"
+        "🔄 **Ready to try again?** Use `/location` when you're ready!"
+    ),
+    'location_service_unavailable': (
+        "🛠️ **Location Service Temporarily Unavailable**\n\n"
+        "Our location processing service is currently experiencing issues.\n\n"
+        "💡 **What you can do:**\n"
+        "• Continue with manual location entry in sales\n"
+        "• Try location sharing again in a few minutes\n"
+        "• Your sales entries will still be saved normally\n\n"
+        "🔄 **Service Status:**\n"
+        "• GPS coordinate processing: ⚠️ Limited\n"
+        "• Address resolution: ⚠️ Limited\n"
+        "• Sales entry logging: ✅ Working\n"
+        "• Analytics: ✅ Working\n\n"
+        "📧 **We're working to restore full service quickly!**"
+    ),
+}
+_STATIC_MESSAGES = {
+    name: (text, _strip_markdown(text, _STRIP_CODE if name == 'api' else None))
+    for name, text in _STATIC_MESSAGES.items()
+}
+
+
+# One user-facing error notice; formatted is the full reply text, built once
+ErrorMsg = namedtuple('ErrorMsg', 'title message action formatted')
+
+
+def _error_msg(title: str, message: str, action: str) -> ErrorMsg:
+    """Build an ErrorMsg with its reply text rendered up front"""
+    return ErrorMsg(title, message, action, f"{title}\n\n{message}\n\n💡 {action}")
 
 
 class ErrorHandler:
     """Centralized error handling system"""
     
-    # User-friendly error messages
-    ERROR_MESSAGES = {
-        ErrorType.VALIDATION_ERROR: {
-            'title': '❌ Invalid Input',
-            'message': 'Please check your input and try again.',
-            'action': 'Use the correct format or ask for help with /help'
-        },
-        ErrorType.API_ERROR: {
-            'title': '🔧 Service Temporarily Unavailable',
-            'message': 'Our AI service is temporarily unavailable.',
-            'action': 'Please try again in a few moments or use the structured format'
-        },
-        ErrorType.DATABASE_ERROR: {
-            'title': '💾 Data Service Issue',
-            'message': 'Unable to save your data right now.',
-            'action': 'Please try again. Your data will be saved once the service is restored'
-        },
-        ErrorType.NETWORK_ERROR: {
-            'title': '🌐 Connection Issue',
-            'message': 'Network connection problem detected.',
-            'action': 'Please check your connection and try again'
-        },
-        ErrorType.PERMISSION_ERROR: {
-            'title': '🔒 Access Denied',
-            'message': 'You don\'t have permission to perform this action.',
-            'action': 'Contact an administrator if you believe this is an error'
-        },
-        ErrorType.RATE_LIMIT_ERROR: {
-            'title': '⏰ Too Many Requests',
-            'message': 'You\'re sending messages too quickly.',
-            'action': 'Please wait a moment before trying again'
-        },
-        ErrorType.LOCATION_ERROR: {
-            'title': '📍 Location Service Issue',
-            'message': 'Unable to process your location data.',
-            'action': 'Try sharing your location again or check your GPS settings'
-        },
-        ErrorType.GEOCODING_ERROR: {
-            'title': '🌍 Address Resolution Failed',
-            'message': 'Unable to convert your coordinates to an address.',
-            'action': 'Your location will be saved with coordinates only'
-        },
-        ErrorType.GPS_ERROR: {
-            'title': '🛰️ GPS Signal Issue',
-            'message': 'Your GPS coordinates appear to be invalid or inaccurate.',
-            'action': 'Please ensure GPS is enabled and try sharing location again'
-        },
-        ErrorType.UNKNOWN_ERROR: {
-            'title': '⚠️ Unexpected Error',
-            'message': 'Something unexpected happened.',
-            'action': 'Please try again or contact support if the issue persists'
-        }
-    }
+    # User-friendly error messages (read-only; namedtuples, so fields are attribute reads)
+    ERROR_MESSAGES = MappingProxyType({
+        ErrorType.VALIDATION_ERROR: _error_msg(
+            '❌ Invalid Input',
+            'Please check your input and try again.',
+            'Use the correct format or ask for help with /help'
+        ),
+        ErrorType.API_ERROR: _error_msg(
+            '🔧 Service Temporarily Unavailable',
+            'Our AI service is temporarily unavailable.',
+            'Please try again in a few moments or use the structured format'
+        ),
+        ErrorType.DATABASE_ERROR: _error_msg(
+            '💾 Data Service Issue',
+            'Unable to save your data right now.',
+            'Please try again. Your data will be saved once the service is restored'
+        ),
+        ErrorType.NETWORK_ERROR: _error_msg(
+            '🌐 Connection Issue',
+            'Network connection problem detected.',
+            'Please check your connection and try again'
+        ),
+        ErrorType.PERMISSION_ERROR: _error_msg(
+            '🔒 Access Denied',
+            'You don\'t have permission to perform this action.',
+            'Contact an administrator if you believe this is an error'
+        ),
+        ErrorType.RATE_LIMIT_ERROR: _error_msg(
+            '⏰ Too Many Requests',
+            'You\'re sending messages too quickly.',
+            'Please wait a moment before trying again'
+        ),
+        ErrorType.LOCATION_ERROR: _error_msg(
+            '📍 Location Service Issue',
+            'Unable to process your location data.',
+            'Try sharing your location again or check your GPS settings'
+        ),
+        ErrorType.GEOCODING_ERROR: _error_msg(
+            '🌍 Address Resolution Failed',
+            'Unable to convert your coordinates to an address.',
+            'Your location will be saved with coordinates only'
+        ),
+        ErrorType.GPS_ERROR: _error_msg(
+            '🛰️ GPS Signal Issue',
+            'Your GPS coordinates appear to be invalid or inaccurate.',
+            'Please ensure GPS is enabled and try sharing location again'
+        ),
+        ErrorType.UNKNOWN_ERROR: _error_msg(
+            '⚠️ Unexpected Error',
+            'Something unexpected happened.',
+            'Please try again or contact support if the issue persists'
+        )
+    })
+    
+    # Errors remembered per user in context.user_data['recent_errors']
+    ERROR_HISTORY_SIZE = 8
+    
+    # The same entries as a tuple indexed by ErrorType, for the per-error lookup
+    _ERROR_MSGS = tuple(info for _, info in sorted(ERROR_MESSAGES.items()))
     
     @classmethod
     def classify_error(cls, error: Exception) -> ErrorType:
         """Classify an error based on its type and message"""
-        error_message = str(error).lower()
+        for base in type(error).__mro__:
+            error_type = _EXC_TYPE_MAP.get(base)
+            if error_type is not None:
+                return error_type
         
-        # Check for specific error types
-        if 'validation' in error_message or 'invalid' in error_message:
-            return ErrorType.VALIDATION_ERROR
-        elif 'api' in error_message or 'gemini' in error_message:
-            return ErrorType.API_ERROR
-        elif 'sheet' in error_message or 'database' in error_message or 'gspread' in error_message:
-            return ErrorType.DATABASE_ERROR
-        elif 'network' in error_message or 'connection' in error_message or 'timeout' in error_message:
-            return ErrorType.NETWORK_ERROR
-        elif 'permission' in error_message or 'unauthorized' in error_message or 'forbidden' in error_message:
-            return ErrorType.PERMISSION_ERROR
-        elif 'rate limit' in error_message or 'too many' in error_message:
-            return ErrorType.RATE_LIMIT_ERROR
-        elif 'location' in error_message or 'coordinates' in error_message:
-            return ErrorType.LOCATION_ERROR
-        elif 'geocoding' in error_message or 'address' in error_message or 'nominatim' in error_message:
-            return ErrorType.GEOCODING_ERROR
-        elif 'gps' in error_message or 'latitude' in error_message or 'longitude' in error_message:
-            return ErrorType.GPS_ERROR
-        else:
-            return ErrorType.UNKNOWN_ERROR
+        return _classify_cached(str(error).lower())
     
     @classmethod
     async def handle_error(cls, error: Exception, update: Optional[Update] = None, 
@@ -121,296 +372,187 @@ class ErrorHandler:
             context: Telegram context object
             custom_message: Custom error message to show user
         """
-        # Log the error with full traceback
+        # Log the error with its own traceback (formatted by logging only if the record is emitted)
         error_type = cls.classify_error(error)
-        logger.error(
-            f"Error occurred - Type: {error_type.value}, "
-            f"Message: {str(error)}, "
-            f"Traceback: {traceback.format_exc()}"
-        )
+        logger.error("Error occurred - Type: %s, Message: %s", error_type.label, error, exc_info=error)
         
-        # Store error in context for potential retry
-        if context and hasattr(context, 'user_data'):
-            context.user_data['last_error'] = {
-                'type': error_type.value,
-                'message': str(error),
-                'timestamp': logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                    'error', 40, '', 0, '', (), None
-                ))
-            }
+        # Keep a short per-user history of (type, message, unix time) for potential retry;
+        # a repeat of the newest entry is not stored again
+        if context and getattr(context, 'user_data', None) is not None:
+            errors = context.user_data.setdefault('recent_errors', deque(maxlen=cls.ERROR_HISTORY_SIZE))
+            record = (error_type.label, str(error), time.time())
+            if not errors or errors[-1][:2] != record[:2]:
+                errors.append(record)
         
-        # Notify user if update is available
-        if update and hasattr(update, 'message') and update.message:
-            try:
-                if custom_message:
-                    await update.message.reply_text(custom_message)
-                else:
-                    error_info = cls.ERROR_MESSAGES.get(error_type, cls.ERROR_MESSAGES[ErrorType.UNKNOWN_ERROR])
-                    
-                    message = f"{error_info['title']}\n\n"
-                    message += f"{error_info['message']}\n\n"
-                    message += f"💡 {error_info['action']}"
-                    
-                    # Add specific error details for validation errors
-                    if error_type == ErrorType.VALIDATION_ERROR:
-                        message += f"\n\n📝 Details: {str(error)}"
-                    
-                    await update.message.reply_text(message)
-            except Exception as notification_error:
-                logger.error(f"Failed to send error notification: {notification_error}")
+        # Notify user if update is available (once per error type per chat within the dedup window)
+        message = getattr(update, 'message', None)
+        if message is None:
+            return
+        if custom_message:
+            # Caller-chosen text is always delivered
+            text = custom_message
+        else:
+            # Every ErrorType has a prebuilt entry, so this is a single tuple index
+            text = cls._ERROR_MSGS[error_type].formatted
+            dedup_key = error_type
+            
+            # Add specific error details for validation errors; a different detail is
+            # new feedback, so those notices are deduplicated on the full text
+            if error_type is ErrorType.VALIDATION_ERROR:
+                text += f"\n\n📝 Details: {str(error)}"
+                dedup_key = text
+            
+            if not _should_notify(message.chat_id, dedup_key):
+                logger.debug("Skipping repeat %s notice for chat %s", error_type.label, message.chat_id)
+                return
+        
+        try:
+            await asyncio.wait_for(message.reply_text(text), REPLY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Error notification timed out after {REPLY_TIMEOUT_SECONDS}s, dropped")
+        except Exception as notification_error:
+            logger.error(f"Failed to send error notification: {notification_error}")
     
     @classmethod
-    def create_error_report(cls, error: Exception, context_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Create a detailed error report for debugging"""
+    def create_error_report(cls, error: Exception, context_data: Optional[Dict[str, Any]] = None,
+                            include_traceback: bool = False) -> Dict[str, Any]:
+        """Create a detailed error report for debugging (pass include_traceback=True for the formatted traceback)"""
         error_type = cls.classify_error(error)
         
         report = {
-            'error_type': error_type.value,
+            'error_type': error_type.label,
             'error_message': str(error),
             'error_class': error.__class__.__name__,
-            'traceback': traceback.format_exc(),
-            'timestamp': logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                'error', 40, '', 0, '', (), None
-            ))
+            'timestamp': _timestamp()
         }
         
+        if include_traceback:
+            report['traceback'] = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+        
         if context_data:
             report['context'] = context_data
         
         return report
     
+    @classmethod
+    async def _reply_markdown(cls, update: Update, markdown: str, plain: Optional[str] = None) -> None:
+        """
+        Reply with Markdown, falling back to plain text if Telegram rejects it.
+        Each send is bounded by REPLY_TIMEOUT_SECONDS; a timed-out notice is dropped
+        rather than retried as plain text, which could double the wait.
+        """
+        reply = getattr(getattr(update, 'message', None), 'reply_text', None)
+        if reply is None:
+            return  # Nothing to reply to (e.g. a callback query or channel post update)
+        
+        try:
+            if _MARKDOWN_CHARS.isdisjoint(markdown):
+                # Nothing to parse: send as-is and skip the Markdown attempt
+                await asyncio.wait_for(reply(markdown), REPLY_TIMEOUT_SECONDS)
+                return
+            
+            try:
+                await asyncio.wait_for(reply(markdown, parse_mode='Markdown'), REPLY_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                # Last resort only: dynamic text is escaped, so Telegram shouldn't reject the Markdown
+                await asyncio.wait_for(
+                    reply(plain if plain is not None else _strip_markdown(markdown)), REPLY_TIMEOUT_SECONDS
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Error notification timed out after {REPLY_TIMEOUT_SECONDS}s, dropped")
+    
     @classmethod
     async def handle_validation_error(cls, error: Exception, update: Update, 
                                     field_name: Optional[str] = None) -> None:
         """Handle validation errors with specific guidance"""
-        error_message = f"❌ **Input Error**\n\n"
-        
         if field_name:
-            error_message += f"Issue with **{field_name}**: {str(error)}\n\n"
+            details = f"Issue with **{_escape_markdown(field_name)}**: {_escape_markdown(error)}\n\n"
         else:
-            error_message += f"{str(error)}\n\n"
-        
-        error_message += "💡 **How to fix:**\n"
-        error_message += "• Use the correct format shown in the examples\n"
-        error_message += "• Check for typos in numbers and text\n"
-        error_message += "• Make sure all required fields are filled\n\n"
-        error_message += "Need help? Use /help for examples and guidance."
+            details = f"{_escape_markdown(error)}\n\n"
         
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception as e:
-            # Fallback to plain text if markdown fails
-            await update.message.reply_text(error_message.replace('*', ''))
+        await cls._reply_markdown(update, f"❌ **Input Error**\n\n{details}{_STATIC_MESSAGES['validation_help'][0]}")
     
     @classmethod
     async def handle_api_error(cls, error: Exception, update: Update) -> None:
         """Handle API-related errors with fallback suggestions"""
-        error_message = "🔧 **Service Issue**\n\n"
-        error_message += "Our AI parsing service is temporarily unavailable.\n\n"
-        error_message += "💡 **What you can do:**\n"
-        error_message += "• Try using the structured format:\n"
-        error_message += "```\n"
-        error_message += "Client: Apollo Pharmacy\n"
-        error_message += "Location: Bandra\n"
-        error_message += "Orders: 3\n"
-        error_message += "Amount: ₹24000\n"
-        error_message += "Remarks: Good conversation\n"
-        error_message += "```\n"
-        error_message += "• Or try again in a few minutes"
-        
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception:
-            # Fallback without markdown
-            plain_message = error_message.replace('*', '').replace('`', '')
-            await update.message.reply_text(plain_message)
+        await cls._reply_markdown(update, *_STATIC_MESSAGES['api'])
     
     @classmethod
     async def handle_database_error(cls, error: Exception, update: Update, 
                                   entry_data: Optional[Dict[str, Any]] = None) -> None:
         """Handle database errors with data preservation"""
-        error_message = "💾 **Data Service Issue**\n\n"
-        error_message += "Unable to save your entry right now, but don't worry!\n\n"
-        
+        details = ""
         if entry_data:
-            error_message += "📋 **Your entry details:**\n"
-            for key, value in entry_data.items():
-                if key and value:
-                    error_message += f"• {key.title()}: {value}\n"
-            error_message += "\n"
-        
-        error_message += "💡 **What happens next:**\n"
-        error_message += "• Your data is temporarily stored\n"
-        error_message += "• Try again in a few minutes\n"
-        error_message += "• Contact support if the issue persists"
+            details = "📋 **Your entry details:**\n" + "".join(
+                f"• {_escape_markdown(key.title())}: {_escape_markdown(value)}\n" for key, value in entry_data.items() if key and value
+            ) + "\n"
         
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception:
-            plain_message = error_message.replace('*', '')
-            await update.message.reply_text(plain_message)
-
-
-# Convenience functions for common error scenarios
-async def handle_error(error: Exception, update: Optional[Update] = None, 
-                      context: Optional[ContextTypes.DEFAULT_TYPE] = None) -> None:
-    """Quick error handling function"""
-    await ErrorHandler.handle_error(error, update, context)
-
-
-async def handle_validation_error(error: Exception, update: Update, field_name: Optional[str] = None) -> None:
-    """Quick validation error handling"""
-    await ErrorHandler.handle_validation_error(error, update, field_name)
-
-
-async def handle_api_error(error: Exception, update: Update) -> None:
-    """Quick API error handling"""
-    await ErrorHandler.handle_api_error(error, update)
-
-
-async def handle_database_error(error: Exception, update: Update, entry_data: Optional[Dict[str, Any]] = None) -> None:
-    """Quick database error handling"""
-    await ErrorHandler.handle_database_error(error, update, entry_data)  
-    
-@classmethod
-async def handle_location_error(cls, error: Exception, update: Update, 
-                                error_context: Optional[str] = None) -> None:
-    """Handle location-related errors with specific guidance"""
-    error_message = "📍 **Location Service Issue**\n\n"
+        await cls._reply_markdown(
+            update, f"{_STATIC_MESSAGES['db_service'][0]}{details}{_STATIC_MESSAGES['db_next_steps'][0]}"
+        )
     
-    if error_context:
-        error_message += f"Context: {error_context}\n\n"
-
-    error_message += f"Issue: {str(error)}\n\n"
-    error_message += "💡 **Troubleshooting Steps:**\n"
-    error_message += "• Ensure GPS is enabled on your device\n"
-    error_message += "• Check that Telegram has location permissions\n"
-    error_message += "• Try moving to an area with better GPS signal\n"
-    error_message += "• Wait a moment and try sharing location again\n\n"
-    error_message += "🔄 **Alternative:** You can continue without GPS - just enter location manually in your sales entries."
-
-    try:
-        await update.message.reply_text(error_message, parse_mode='Markdown')
-    except Exception:
-        await update.message.reply_text(error_message.replace('*', ''))
+    @classmethod
+    async def handle_location_error(cls, error: Exception, update: Update, 
+                                    error_context: Optional[str] = None) -> None:
+        """Handle location-related errors with specific guidance"""
+        context_line = f"Context: {_escape_markdown(error_context)}\n\n" if error_context else ""
+        
+        await cls._reply_markdown(
+            update,
+            f"📍 **Location Service Issue**\n\n{context_line}Issue: {_escape_markdown(error)}\n\n"
+            f"{_STATIC_MESSAGES['location_troubleshooting'][0]}"
+        )
     
     @classmethod
     async def handle_geocoding_error(cls, error: Exception, update: Update,
                                    coordinates: Optional[tuple] = None) -> None:
         """Handle geocoding service errors with fallback options"""
-        error_message = "🌍 **Address Resolution Issue**\n\n"
-        error_message += "Unable to convert your GPS coordinates to a readable address.\n\n"
-        
+        coordinates_line = ""
         if coordinates:
             lat, lon = coordinates
-            error_message += f"📍 **Your Coordinates:** {lat:.6f}, {lon:.6f}\n\n"
-        
-        error_message += "💡 **What this means:**\n"
-        error_message += "• Your location is still saved with GPS coordinates\n"
-        error_message += "• Sales entries will include coordinate data\n"
-        error_message += "• Analytics will work with coordinate-based insights\n\n"
-        error_message += "🔧 **Possible causes:**\n"
-        error_message += "• Geocoding service temporarily unavailable\n"
-        error_message += "• Location is in a remote area\n"
-        error_message += "• Network connectivity issues\n\n"
-        error_message += "✅ **Your location data is still valuable for analytics!**"
+            coordinates_line = f"📍 **Your Coordinates:** {lat:.6f}, {lon:.6f}\n\n"
         
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception:
-            await update.message.reply_text(error_message.replace('*', ''))
+        await cls._reply_markdown(
+            update,
+            "🌍 **Address Resolution Issue**\n\n"
+            "Unable to convert your GPS coordinates to a readable address.\n\n"
+            f"{coordinates_line}{_STATIC_MESSAGES['geocoding_help'][0]}"
+        )
     
     @classmethod
     async def handle_gps_accuracy_warning(cls, update: Update, accuracy: float,
                                         threshold: float = 100) -> None:
         """Handle GPS accuracy warnings"""
-        warning_message = "⚠️ **GPS Accuracy Warning**\n\n"
-        warning_message += f"Your GPS accuracy is {accuracy:.0f} meters.\n"
-        warning_message += f"For best results, we recommend accuracy under {threshold} meters.\n\n"
-        warning_message += "💡 **To improve accuracy:**\n"
-        warning_message += "• Move to an open area away from buildings\n"
-        warning_message += "• Ensure GPS is enabled in device settings\n"
-        warning_message += "• Wait for GPS to get a better signal\n"
-        warning_message += "• Try sharing location again in a few moments\n\n"
-        warning_message += "🤔 **Continue anyway?**\n"
-        warning_message += "Your location will still be saved, but may be less precise for analytics."
-        
-        try:
-            await update.message.reply_text(warning_message, parse_mode='Markdown')
-        except Exception:
-            await update.message.reply_text(warning_message.replace('*', ''))
+        await cls._reply_markdown(
+            update,
+            "⚠️ **GPS Accuracy Warning**\n\n"
+            f"Your GPS accuracy is {accuracy:.0f} meters.\n"
+            f"For best results, we recommend accuracy under {threshold} meters.\n\n"
+            f"{_STATIC_MESSAGES['gps_accuracy_tips'][0]}"
+        )
     
     @classmethod
     async def handle_location_permission_denied(cls, update: Update) -> None:
         """Handle location permission denied scenarios"""
-        error_message = "🔒 **Location Permission Required**\n\n"
-        error_message += "It looks like location sharing was denied or cancelled.\n\n"
-        error_message += "📍 **To enable location features:**\n\n"
-        error_message += "**On Android:**\n"
-        error_message += "1. Open Telegram settings\n"
-        error_message += "2. Go to Privacy and Security\n"
-        error_message += "3. Enable Location permissions\n"
-        error_message += "4. Try `/location` command again\n\n"
-        error_message += "**On iOS:**\n"
-        error_message += "1. Go to iPhone Settings\n"
-        error_message += "2. Find Telegram in app list\n"
-        error_message += "3. Enable Location permissions\n"
-        error_message += "4. Try `/location` command again\n\n"
-        error_message += "💡 **Benefits of location sharing:**\n"
-        error_message += "• Automatic location tagging in sales entries\n"
-        error_message += "• Territory performance analytics\n"
-        error_message += "• Route optimization insights\n"
-        error_message += "• Geographic sales distribution analysis\n\n"
-        error_message += "🔄 **Ready to try again?** Use `/location` when you're ready!"
-        
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception:
-            await update.message.reply_text(error_message.replace('*', ''))
+        await cls._reply_markdown(update, *_STATIC_MESSAGES['location_permission_android_ios'])
     
     @classmethod
     async def handle_location_service_unavailable(cls, update: Update) -> None:
         """Handle location service unavailable scenarios"""
-        error_message = "🛠️ **Location Service Temporarily Unavailable**\n\n"
-        error_message += "Our location processing service is currently experiencing issues.\n\n"
-        error_message += "💡 **What you can do:**\n"
-        error_message += "• Continue with manual location entry in sales\n"
-        error_message += "• Try location sharing again in a few minutes\n"
-        error_message += "• Your sales entries will still be saved normally\n\n"
-        error_message += "🔄 **Service Status:**\n"
-        error_message += "• GPS coordinate processing: ⚠️ Limited\n"
-        error_message += "• Address resolution: ⚠️ Limited\n"
-        error_message += "• Sales entry logging: ✅ Working\n"
-        error_message += "• Analytics: ✅ Working\n\n"
-        error_message += "📧 **We're working to restore full service quickly!**"
-        
-        try:
-            await update.message.reply_text(error_message, parse_mode='Markdown')
-        except Exception:
-            await update.message.reply_text(error_message.replace('*', ''))
+        await cls._reply_markdown(update, *_STATIC_MESSAGES['location_service_unavailable'])
     
     @classmethod
     def log_location_event(cls, event_type: str, user_id: int, details: Dict[str, Any]) -> None:
         """Log location-related events for monitoring and debugging"""
-        log_entry = {
-            'event_type': event_type,
-            'user_id': user_id,
-            'timestamp': logger.handlers[0].formatter.formatTime(logger.makeRecord(
-                'location', 20, '', 0, '', (), None
-            )),
-            'details': details
-        }
-        
-        if event_type == 'location_shared':
-            logger.info(f"📍 Location shared by user {user_id}: {details}")
-        elif event_type == 'location_error':
-            logger.error(f"📍 Location error for user {user_id}: {details}")
-        elif event_type == 'geocoding_failed':
-            logger.warning(f"🌍 Geocoding failed for user {user_id}: {details}")
-        elif event_type == 'gps_accuracy_warning':
-            logger.warning(f"⚠️ GPS accuracy warning for user {user_id}: {details}")
+        # %-style args: the details dict is only rendered if the record is emitted
+        known = _LOCATION_EVENT_LOGS.get(event_type)
+        if known is not None:
+            level, template = known
+            logger.log(level, template, user_id, details)
         else:
-            logger.info(f"📍 Location event '{event_type}' for user {user_id}: {details}")
+            logger.info("📍 Location event '%s' for user %s: %s", event_type, user_id, details)
 
 
 # Convenience functions for common error scenarios
@@ -232,6 +232,11 @@ Output: {{"client": "XYZ Hospital", "location": "Mumbai", "orders": 15, "amount"
 ✅ Output:
 """
 
+# ✂️ Static halves around {text}, unescaped once so each prompt is a plain concatenation
+PROMPT_PREFIX, PROMPT_SUFFIX = (
+    part.replace("{{", "{").replace("}}", "}") for part in PROMPT_TEMPLATE.split("{text}")
+)
+
 # 🚀 Enhanced functions with multi-API key support
 # 🚀 Enhanced functions with smart API key allocation
 def extract_with_gemini(text: str) -> dict | None:
@@ -241,7 +246,7 @@ def extract_with_gemini(text: str) -> dict | None:
         from smart_rate_limiter import rate_limiter
         
         # Format the prompt with user message
-        prompt = PROMPT_TEMPLATE.format(text=text)
+        prompt = PROMPT_PREFIX + text + PROMPT_SUFFIX
         
         # Use smart manager for transaction parsing with rate limiting
         model, key_used = smart_api_manager.get_model_for_task("transaction_parsing")
@@ -312,7 +317,7 @@ async def extract_with_gemini_parallel(texts: List[str]) -> List[Optional[dict]]
         print(f"🚀 Processing {len(texts)} texts in parallel using {len(API_KEYS)} API keys")
         
         # Create prompts for all texts
-        prompts = [PROMPT_TEMPLATE.format(text=text) for text in texts]
+        prompts = [PROMPT_PREFIX + text + PROMPT_SUFFIX for text in texts]
         
         # Process in parallel using API manager
         # 🚀 Use smart parallel processing
@@ -382,8 +382,9 @@ class LocationHandler:
     async def show_location_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show current GPS location status"""
         try:
+            # company_manager is keyed by the int id; location_storage by its string form
             user_id = str(update.effective_user.id)
-            current_company = company_manager.get_user_company(user_id)
+            current_company = company_manager.get_user_company(update.effective_user.id)
             
             if not current_company:
                 await update.message.reply_text(
@@ -420,8 +421,9 @@ class LocationHandler:
     async def clear_location(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Clear stored GPS location data"""
         try:
+            # company_manager is keyed by the int id; location_storage by its string form
             user_id = str(update.effective_user.id)
-            current_company = company_manager.get_user_company(user_id)
+            current_company = company_manager.get_user_company(update.effective_user.id)
             
             if not current_company:
                 await update.message.reply_text(
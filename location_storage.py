@@ -7,11 +7,20 @@ Handles GPS location data storage and retrieval with privacy protection
 
 import json
 import os
+import time
 import datetime
 from typing import Dict, Optional, Any
 from logger import logger
 
+# Short-lived status cache shared by every LocationStorage instance (the live
+# position adapter uses its own instance over the same file):
+# {(user_id, company_id): (monotonic_time, status)}
+_status_cache: Dict[tuple, tuple] = {}
+
 class LocationStorage:
+    # Seconds a computed location status is reused before re-reading the file
+    STATUS_CACHE_TTL = 30
+    
     def __init__(self):
         self.storage_file = "data/location_storage.json"
         self.ensure_storage_file()
@@ -47,6 +56,7 @@ class LocationStorage:
             with open(self.storage_file, 'w') as f:
                 json.dump(data, f, indent=2)
             
+            _status_cache.pop((user_id, company_id), None)
             logger.info(f"📍 Location stored for user {user_id} in company {company_id}")
             return True
             
@@ -94,6 +104,7 @@ class LocationStorage:
                 with open(self.storage_file, 'w') as f:
                     json.dump(data, f, indent=2)
                 
+                _status_cache.pop((user_id, company_id), None)
                 logger.info(f"📍 Location cleared for user {user_id} in company {company_id}")
                 return True
             
@@ -104,31 +115,48 @@ class LocationStorage:
             return False
     
     def get_location_status(self, user_id: str, company_id: str) -> Dict[str, Any]:
-        """Get enhanced location status for a user in a specific company"""
+        """Get enhanced location status for a user in a specific company (cached briefly)"""
+        key = (user_id, company_id)
+        now = time.monotonic()
+        cached = _status_cache.get(key)
+        if cached and now - cached[0] < self.STATUS_CACHE_TTL:
+            return dict(cached[1])
+        
+        status = self._build_location_status(user_id, company_id)
+        _status_cache[key] = (now, status)
+        return dict(status)
+    
+    def _build_location_status(self, user_id: str, company_id: str) -> Dict[str, Any]:
+        """Compute the location status from stored data"""
+        no_location = {
+            'has_location': False,
+            'message': "📍 No GPS location stored. Use /location to share your location."
+        }
         location_data = self.get_location(user_id, company_id)
         
         if not location_data:
+            return no_location
+        
+        try:
+            timestamp = datetime.datetime.fromisoformat(location_data['timestamp'])
+            time_diff = datetime.datetime.now() - timestamp
+            days_old = time_diff.days
+            hours_old = time_diff.total_seconds() / 3600
+            
             return {
-                'has_location': False,
-                'message': "📍 No GPS location stored. Use /location to share your location."
+                'has_location': True,
+                'location': location_data['address'].get('short', 'Unknown location'),
+                'timestamp': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                'days_old': days_old,
+                'hours_old': hours_old,
+                'expires_in': max(0, 30 - days_old),
+                'coordinates': location_data['coordinates'],
+                'accuracy': location_data.get('accuracy', 'medium'),
+                'expired': days_old >= 30
             }
-        
-        timestamp = datetime.datetime.fromisoformat(location_data['timestamp'])
-        time_diff = datetime.datetime.now() - timestamp
-        days_old = time_diff.days
-        hours_old = time_diff.total_seconds() / 3600
-        
-        return {
-            'has_location': True,
-            'location': location_data['address'].get('short', 'Unknown location'),
-            'timestamp': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            'days_old': days_old,
-            'hours_old': hours_old,
-            'expires_in': max(0, 30 - days_old),
-            'coordinates': location_data['coordinates'],
-            'accuracy': location_data.get('accuracy', 'medium'),
-            'expired': days_old >= 30
-        }
+        except (KeyError, AttributeError, ValueError) as e:
+            logger.debug(f"📍 Malformed location record for user {user_id} in company {company_id}: {e}")
+            return no_location
     
     def cleanup_expired_locations(self) -> int:
         """Clean up expired location data (older than 30 days)"""
@@ -164,6 +192,8 @@ class LocationStorage:
             with open(self.storage_file, 'w') as f:
                 json.dump(data, f, indent=2)
             
+            _status_cache.clear()
+            
             if cleaned_count > 0:
                 logger.info(f"📍 Cleaned up {cleaned_count} expired location entries")
             
@@ -11,6 +11,7 @@ from telegram.ext import (
 # ✅ Configuration and logging
 from config import BOT_TOKEN, DATA_DIR
 from logger import logger
+from company_manager import company_manager
 
 # ✅ Command functions
 from commands import (
@@ -34,6 +35,7 @@ from commands import (
 from company_commands import (
     company_select_command,
     handle_company_callback,
+    COMPANY_CALLBACK_PATTERN,
     admin_panel_command,
     admin_users_command,
     admin_stats_command,
@@ -128,10 +130,19 @@ def main():
             logger.error("❌ System health check failed. Exiting.")
             sys.exit(1)
 
+        # 🏢 Load user-company mappings up front rather than on the first update
+        company_manager.warm()
+
         # 🤖 Build app with enhanced configuration
         application = (
             Application.builder()
             .token(BOT_TOKEN)
+            # 🔌 Larger keep-alive pool so the loading→edit reply pairs reuse TLS connections
+            .connection_pool_size(100)
+            .pool_timeout(30)
+            .connect_timeout(5)
+            .read_timeout(10)
+            .write_timeout(10)
             .build()
         )
 
@@ -184,7 +195,7 @@ def main():
         application.add_handler(MessageHandler(filters.LOCATION, handle_location_message))
 
         # 🎛 Interactive menu handlers
-        application.add_handler(CallbackQueryHandler(handle_company_callback, pattern=r"^(register_company_|switch_company_|company_info_|close_menu)"))
+        application.add_handler(CallbackQueryHandler(handle_company_callback, pattern=COMPANY_CALLBACK_PATTERN, block=False))
         application.add_handler(CallbackQueryHandler(menu_handler.handle_callback_query))
 
         # ✉️ Message handler for unstructured inputs
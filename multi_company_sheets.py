@@ -11,15 +11,22 @@ from logger import logger
 from company_manager import company_manager
 from typing import List, Dict, Optional
 from datetime import datetime
+import time
 import pandas as pd
 
 class MultiCompanySheetManager:
     """📊 Multi-Company Google Sheets Manager"""
     
+    # Seconds computed company stats are reused before re-reading the sheet
+    STATS_CACHE_TTL = 60
+    
     def __init__(self):
         """📊 Initialize Multi-Company Sheet Manager with error handling"""
         logger.info("🔄 Initializing multi-company Google Sheets connection...")
         
+        # Stats cache: {company_key: (monotonic_time, stats)}
+        self.stats_cache = {}
+        
         try:
             # Google Sheets setup with error handling
             self.scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
@@ -141,6 +148,7 @@ class MultiCompanySheetManager:
             enhanced_row[13] = datetime.now().isoformat()  # Last Modified
             
             sheet.append_row(enhanced_row)
+            self.stats_cache.pop(company_key, None)
             logger.info(f"📝 Successfully appended row to {company_key} sheet: {enhanced_row[0] if enhanced_row else 'empty'}")
             return True
             
@@ -236,8 +244,20 @@ class MultiCompanySheetManager:
             logger.error(f"❌ Failed to get all records: {str(e)}")
             return []
     
-    def get_company_stats(self, company_key: str) -> Dict:
-        """📈 Get basic stats for a company with safe numeric conversion"""
+    def get_company_stats(self, company_key: str, force_refresh: bool = False) -> Dict:
+        """📈 Get basic stats for a company (cached briefly; force_refresh bypasses the cache)"""
+        now = time.monotonic()
+        cached = self.stats_cache.get(company_key)
+        if not force_refresh and cached and now - cached[0] < self.STATS_CACHE_TTL:
+            return dict(cached[1])
+        
+        stats = self._build_company_stats(company_key)
+        if 'error' not in stats:
+            self.stats_cache[company_key] = (now, stats)
+        return dict(stats)
+    
+    def _build_company_stats(self, company_key: str) -> Dict:
+        """📈 Compute basic stats for a company with safe numeric conversion"""
         try:
             records = self.get_company_records(company_key)
             